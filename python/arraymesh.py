@@ -0,0 +1,702 @@
+#!/usr/bin/env python
+
+"""Flat array storage for the triangle mesh built by voronoi.triangulate.
+
+Vertices, half-edges and faces are small integers indexing parallel arrays,
+so a mesh with a few hundred thousand points is a handful of contiguous
+buffers instead of millions of Python objects.  -1 stands in for None.
+
+"""
+
+import array
+import random
+
+import robust
+import voronoi
+
+
+class ArrayMesh(object):
+    """A DCEL stored in flat arrays.
+
+    'x', 'y' are the vertex positions.
+    'artificial' is 1 for vertices that were not part of the input set.
+    'vertex_edge' is an edge leaving each vertex.
+
+    'origin', 'twin', 'next' and 'face' hold the fields of each half-edge,
+    with the same meaning as the attributes of voronoi.HalfEdge.  Half-edges
+    are allocated in pairs.
+
+    'face_edge' is any edge facing each face.
+    'corners' holds the three vertices of each face in counter-clockwise
+    order, as they were when the face was made.  Faces that have been split
+    or flipped keep their corners so they can still be used for point
+    location.
+    'children' holds three entries per face for the triangle tree.  A face
+    whose first child is -1 is a leaf.  Unused child slots are -1.  A mesh
+    built without history has only leaves; splitting and flipping reuse face
+    numbers in place.
+
+    'order' is the order the input vertices were inserted in.
+
+    """
+
+    def __init__(self):
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.artificial = array.array('b')
+        self.vertex_edge = array.array('l')
+
+        self.origin = array.array('l')
+        self.twin = array.array('l')
+        self.next = array.array('l')
+        self.face = array.array('l')
+
+        self.face_edge = array.array('l')
+        self.corners = array.array('l')
+        self.children = array.array('l')
+
+        self.order = array.array('l')
+
+    def __repr__(self):
+        return 'ArrayMesh({0} vertices, {1} edges, {2} faces)'.format(
+            len(self.x), len(self.origin), len(self.face_edge))
+
+    def add_vertex(self, x, y, artificial=False):
+        """Add a vertex and return its index."""
+        self.x.append(x)
+        self.y.append(y)
+        self.artificial.append(1 if artificial else 0)
+        self.vertex_edge.append(-1)
+        return len(self.x) - 1
+
+    def make_edge_pair(self, v0, v1):
+        """Make an edge from v0 to v1 and return it."""
+        e0 = len(self.origin)
+        e1 = e0 + 1
+        self.origin.extend((v0, v1))
+        self.twin.extend((e1, e0))
+        self.next.extend((-1, -1))
+        self.face.extend((-1, -1))
+        if self.vertex_edge[v0] == -1:
+            self.vertex_edge[v0] = e0
+        if self.vertex_edge[v1] == -1:
+            self.vertex_edge[v1] = e1
+        return e0
+
+    def add_face(self, edge):
+        """Add a leaf face bounded by 'edge' and return its index.
+
+        The edge loop starting at 'edge' must already be closed.
+
+        """
+        nxt = self.next
+        origin = self.origin
+        self.face_edge.append(edge)
+        self.corners.extend((origin[edge], origin[nxt[edge]],
+            origin[nxt[nxt[edge]]]))
+        self.children.extend((-1, -1, -1))
+        return len(self.face_edge) - 1
+
+    def set_face(self, f, edge):
+        """Make face f the face bounded by the closed loop at 'edge'."""
+        nxt = self.next
+        origin = self.origin
+        self.face_edge[f] = edge
+        i = 3 * f
+        self.corners[i:i + 3] = array.array('l', (origin[edge],
+            origin[nxt[edge]], origin[nxt[nxt[edge]]]))
+
+    def make_triangle(self, v0, v1, v2):
+        """Make a triangle with vertices v0, v1, and v2.
+
+        Vertices v0 v1 and v2 must be in counter-clockwise order.
+
+        """
+        e0 = self.make_edge_pair(v0, v1)
+        e1 = self.make_edge_pair(v1, v2)
+        e2 = self.make_edge_pair(v2, v0)
+        self.next[e0] = e1
+        self.next[e1] = e2
+        self.next[e2] = e0
+        f = self.add_face(e0)
+        self.face[e0] = f
+        self.face[e1] = f
+        self.face[e2] = f
+        return f
+
+    def is_leaf(self, f):
+        return self.children[3 * f] == -1
+
+    def leaves(self):
+        """Generate the faces that are part of this triangulation."""
+        children = self.children
+        for f in xrange(len(self.face_edge)):
+            if children[3 * f] == -1:
+                yield f
+
+    def iter_faces(self):
+        """Generate the leaf faces, like voronoi.Triangulation.iter_faces."""
+        return self.leaves()
+
+    def iter_edges(self, unique=True):
+        """Generate the half-edges of the leaf faces.
+
+        Every half-edge borders a leaf face or the outside of the mesh.  If
+        unique is true only one half-edge of each pair is generated.
+
+        """
+        twin = self.twin
+        for e in xrange(len(self.origin)):
+            if not unique or e < twin[e]:
+                yield e
+
+    def iter_vertices(self, include_artificial=False):
+        """Generate the vertex numbers."""
+        artificial = self.artificial
+        for v in xrange(len(self.x)):
+            if include_artificial or not artificial[v]:
+                yield v
+
+    def vertices(self, f):
+        """The vertices of face f as a tuple in counter-clockwise order."""
+        i = 3 * f
+        return tuple(self.corners[i:i + 3])
+
+    def inside(self, f, px, py):
+        """Is the point (px, py) contained in face f?
+
+        Uses the same exact test as voronoi.Triangle.inside so both backends
+        make identical decisions.
+
+        """
+        x = self.x
+        y = self.y
+        a, b, c = self.corners[3 * f:3 * f + 3]
+        orient2d = robust.orient2d
+        return (orient2d(x[a], y[a], x[b], y[b], px, py) >= 0 and
+            orient2d(x[b], y[b], x[c], y[c], px, py) >= 0 and
+            orient2d(x[c], y[c], x[a], y[a], px, py) >= 0)
+
+    def incircle(self, f, d, limit=0):
+        """Is vertex d in the circle defined by face f?
+
+        See voronoi.Triangle.incircle.
+
+        """
+        x = self.x
+        y = self.y
+        a, b, c = self.vertices(f)
+        return robust.incircle(x[a], y[a], x[b], y[b], x[c], y[c],
+            x[d], y[d]) > limit
+
+    def area(self, f):
+        """Return twice the signed area of face f."""
+        x = self.x
+        y = self.y
+        a, b, c = self.vertices(f)
+        return (x[b] - x[a]) * (y[c] - y[b]) - (y[b] - y[a]) * (x[c] - x[b])
+
+    def child(self, f, px, py):
+        """The child of face f which contains the point (px, py)."""
+        children = self.children
+        for i in xrange(3 * f, 3 * f + 3):
+            c = children[i]
+            if c == -1:
+                break
+            if self.inside(c, px, py):
+                return c
+        raise voronoi.OutsideTriangleError()
+
+    def find_leaf(self, px, py, root=0, stats=None):
+        """Returns the leaf face containing the point (px, py).
+
+        If stats is given the descent is recorded in it.
+
+        """
+        f = root
+        children = self.children
+        if stats is None:
+            while children[3 * f] != -1:
+                f = self.child(f, px, py)
+            return f
+
+        depth = 0
+        misses = 0
+        while children[3 * f] != -1:
+            for i in xrange(3 * f, 3 * f + 3):
+                c = children[i]
+                if c == -1:
+                    raise voronoi.OutsideTriangleError()
+                if self.inside(c, px, py):
+                    break
+                misses += 1
+            else:
+                raise voronoi.OutsideTriangleError()
+            f = c
+            depth += 1
+        stats.located(depth, misses)
+        return f
+
+    def walk(self, f, px, py, rng=random, stats=None):
+        """Returns the leaf face containing the point (px, py).
+
+        Walks the live mesh starting from leaf face f.  See
+        voronoi.Triangle.walk.
+
+        """
+        x = self.x
+        y = self.y
+        origin = self.origin
+        twin = self.twin
+        nxt = self.next
+        face = self.face
+        orient2d = robust.orient2d
+
+        entry = -1
+        steps = 0
+        while True:
+            edge = self.face_edge[f]
+            for i in xrange(int(rng.random() * 3)):
+                edge = nxt[edge]
+            for i in xrange(3):
+                if edge != entry:
+                    o = origin[edge]
+                    t = origin[nxt[edge]]
+                    if orient2d(x[o], y[o], x[t], y[t], px, py) < 0:
+                        break
+                edge = nxt[edge]
+            else:
+                if stats is not None:
+                    stats.located(steps)
+                return f
+
+            entry = twin[edge]
+            f = face[entry]
+            if f == -1:
+                raise voronoi.OutsideTriangleError()
+            steps += 1
+
+    def split(self, f, v, history=True):
+        """Split leaf face f into 3 faces around vertex v.
+
+        Returns the three new faces, which become the children of f.  If
+        history is false f is reused as the first of them instead.
+
+        """
+        nxt = self.next
+        face = self.face
+        origin = self.origin
+        twin = self.twin
+
+        side0 = self.face_edge[f]
+        side1 = nxt[side0]
+        side2 = nxt[side1]
+
+        e0 = self.make_edge_pair(v, origin[side0])
+        e1 = self.make_edge_pair(v, origin[side1])
+        e2 = self.make_edge_pair(v, origin[side2])
+
+        nxt[e0] = side0
+        nxt[e1] = side1
+        nxt[e2] = side2
+
+        nxt[twin[e0]] = e2
+        nxt[twin[e1]] = e0
+        nxt[twin[e2]] = e1
+
+        nxt[side0] = twin[e1]
+        nxt[side1] = twin[e2]
+        nxt[side2] = twin[e0]
+
+        if history:
+            f0 = self.add_face(side0)
+        else:
+            f0 = f
+            self.set_face(f, side0)
+        f1 = self.add_face(side1)
+        f2 = self.add_face(side2)
+        face[side0] = f0
+        face[side1] = f1
+        face[side2] = f2
+        face[e0] = f0
+        face[twin[e1]] = f0
+        face[e1] = f1
+        face[twin[e2]] = f1
+        face[e2] = f2
+        face[twin[e0]] = f2
+
+        if history:
+            self.children[3 * f:3 * f + 3] = array.array('l', (f0, f1, f2))
+        return f0, f1, f2
+
+    def far_edge(self, f, v):
+        """Return the edge of face f opposite vertex v."""
+        edge = self.face_edge[f]
+        while self.origin[edge] != v:
+            edge = self.next[edge]
+        return self.next[edge]
+
+    def flip(self, f, v, history=True):
+        """Flip the diagonal formed by face f and the face opposite v.
+
+        Vertex v must be part of face f.  See flip_edge.
+
+        """
+        return self.flip_edge(self.far_edge(f, v), history)
+
+    def flip_edge(self, edge, history=True):
+        """Flip edge to join the vertices opposite it in its two faces.
+
+        Both original faces get the two new faces as children.  Returns the
+        two new faces.  If history is false the original faces are reused
+        instead.  Afterwards edge leaves the vertex that was opposite it in
+        its face.
+
+        """
+        nxt = self.next
+        origin = self.origin
+        twin = self.twin
+        face = self.face
+
+        pair = twin[edge]
+        f = face[edge]
+        v = origin[nxt[nxt[edge]]]
+        neighbor = face[pair]
+        target = origin[nxt[nxt[pair]]]
+
+        v_cw = nxt[edge]
+        v_ccw = nxt[v_cw]
+        t_cw = nxt[pair]
+        t_ccw = nxt[t_cw]
+
+        origin[edge] = v
+        origin[pair] = target
+
+        nxt[v_cw] = edge
+        nxt[v_ccw] = t_cw
+        nxt[t_cw] = pair
+        nxt[t_ccw] = v_cw
+        nxt[edge] = t_ccw
+        nxt[pair] = v_ccw
+
+        if history:
+            h0 = self.add_face(edge)
+            h1 = self.add_face(pair)
+        else:
+            h0 = f
+            h1 = neighbor
+            self.set_face(h0, edge)
+            self.set_face(h1, pair)
+        face[edge] = h0
+        face[t_ccw] = h0
+        face[v_cw] = h0
+        face[pair] = h1
+        face[v_ccw] = h1
+        face[t_cw] = h1
+
+        self.vertex_edge[origin[v_cw]] = v_cw
+        self.vertex_edge[origin[t_cw]] = t_cw
+
+        if history:
+            new = array.array('l', (h0, h1, -1))
+            self.children[3 * f:3 * f + 3] = new
+            self.children[3 * neighbor:3 * neighbor + 3] = new
+        return h0, h1
+
+    def _legalize(self, faces, v, history=True, stats=None):
+        """Flip edges until 'faces' are legal relative to vertex v.
+
+        'faces' are the faces made by splitting a face with v.  Their
+        'face_edge' must be the edge opposite v, as split leaves them.  The
+        edges still to be checked are kept on a stack, as in
+        voronoi._legalize.  If stats is given the incircle tests and flips
+        are recorded in it.
+
+        """
+        nxt = self.next
+        twin = self.twin
+        face = self.face
+        tests = 0
+        flips = 0
+        stack = [self.face_edge[f] for f in reversed(faces)]
+        while stack:
+            edge = stack.pop()
+            pair = twin[edge]
+            neighbor = face[pair]
+            if neighbor == -1:
+                continue
+            tests += 1
+            if not self.incircle(neighbor, v):
+                continue
+            flips += 1
+            self.flip_edge(edge, history)
+            # edge now leaves v.  Check the far sides of both new faces.
+            stack.append(nxt[nxt[pair]])
+            stack.append(nxt[edge])
+
+        if stats is not None:
+            stats.legalized(tests, flips)
+
+    def discard_history(self):
+        """Drop the triangle tree, keeping only the leaf faces.
+
+        Leaves are renumbered in order, so face numbers are dense afterwards.
+
+        """
+        number = array.array('l', [-1]) * len(self.face_edge)
+        face_edge = array.array('l')
+        corners = array.array('l')
+        for f in self.leaves():
+            number[f] = len(face_edge)
+            face_edge.append(self.face_edge[f])
+            corners.extend(self.corners[3 * f:3 * f + 3])
+
+        face = self.face
+        for e in xrange(len(face)):
+            if face[e] != -1:
+                face[e] = number[face[e]]
+
+        self.face_edge = face_edge
+        self.corners = corners
+        self.children = array.array('l', [-1]) * (3 * len(face_edge))
+
+
+def triangulate(verticies, max_coord, locate='dag', keep_history=True,
+        order=None, stats=None):
+    """Compute the Delauny triangulation of 'vertices' into an ArrayMesh.
+
+    Input vertex i becomes mesh vertex i whatever the insertion order.  The
+    three vertices of the enclosing triangle follow the input.  Face 0 is the
+    root of the triangle tree, if one is kept.  See voronoi.triangulate.
+
+    """
+    mesh = ArrayMesh()
+    for vertex in verticies:
+        mesh.add_vertex(vertex.x, vertex.y)
+
+    n = len(mesh.x)
+    for x, y in voronoi._enclosing(max_coord):
+        mesh.add_vertex(x, y, True)
+    root = mesh.make_triangle(n, n + 1, n + 2)
+
+    if order is None:
+        mesh.order = array.array('l', xrange(n))
+    else:
+        mesh.order = array.array('l', order)
+
+    x = mesh.x
+    y = mesh.y
+    if locate == 'walk':
+        rng = random.Random(0)
+        leaf = root
+        for v in mesh.order:
+            if stats is not None:
+                start = stats.clock()
+            leaf = mesh.walk(leaf, x[v], y[v], rng, stats)
+            if stats is not None:
+                located = stats.clock()
+            children = mesh.split(leaf, v, history=False)
+            if stats is not None:
+                split = stats.clock()
+            mesh._legalize(children, v, history=False, stats=stats)
+            if stats is not None:
+                stats.inserted(start, located, split, stats.clock())
+        return mesh
+
+    for v in mesh.order:
+        if stats is not None:
+            start = stats.clock()
+        leaf = mesh.find_leaf(x[v], y[v], root, stats)
+        if stats is not None:
+            located = stats.clock()
+        children = mesh.split(leaf, v)
+        if stats is not None:
+            split = stats.clock()
+        mesh._legalize(children, v, stats=stats)
+        if stats is not None:
+            stats.inserted(start, located, split, stats.clock())
+
+    if not keep_history:
+        mesh.discard_history()
+    return mesh
+
+
+def from_triangles(x, y, artificial, triangles):
+    """Build an ArrayMesh from a list of triangles.
+
+    x, y and artificial describe the vertices.  triangles holds
+    counter-clockwise triples of vertex indices, which become faces in the
+    same order.  There is no triangle tree.
+
+    """
+    mesh = ArrayMesh()
+    for i in xrange(len(x)):
+        mesh.add_vertex(x[i], y[i], artificial[i])
+    mesh.order = array.array('l', (i for i in xrange(len(x))
+        if not artificial[i]))
+
+    edges = {}
+    for corners in triangles:
+        loop = []
+        for i in xrange(3):
+            v0 = corners[i]
+            v1 = corners[(i + 1) % 3]
+            edge = edges.pop((v1, v0), None)
+            if edge is None:
+                edge = mesh.make_edge_pair(v0, v1)
+                edges[(v0, v1)] = edge
+            else:
+                edge = mesh.twin[edge]
+            loop.append(edge)
+
+        for i in xrange(3):
+            mesh.next[loop[i]] = loop[(i + 1) % 3]
+        f = mesh.add_face(loop[0])
+        for edge in loop:
+            mesh.face[edge] = f
+    return mesh
+
+
+def from_voronoi(triangle, verticies=None):
+    """The leaf faces of an object mesh as an ArrayMesh.
+
+    triangle is anything voronoi.triangulate returns for the 'object'
+    backend, or a voronoi.Triangulation.  Returns the mesh and the list of
+    voronoi.Vertex objects behind its vertex numbers.  Given the list of
+    input verticies, input vertex i becomes mesh vertex i, as with
+    triangulate's 'array' backend, and the artificial vertices follow.
+    Otherwise a Triangulation keeps its registry order, and the input
+    vertices of a triangulate result come first in no particular order,
+    followed by the artificial ones.
+
+    Object meshes do not remember the order their vertices were inserted
+    in, so the 'order' of the mesh just lists the input vertices by number.
+
+    An ArrayMesh has no vertex at infinity, so a mesh triangulated with
+    boundary='infinite' raises ValueError.
+
+    """
+    faces = [face.data for face in triangle.iter_faces()]
+    if isinstance(triangle, voronoi.Triangulation):
+        mesh_verticies = triangle.verticies
+    else:
+        mesh_verticies = list(triangle.iter_vertices(include_artificial=True))
+        mesh_verticies.sort(key=lambda vertex: vertex.artificial)
+        if any(vertex.x is None for vertex in mesh_verticies):
+            raise ValueError('an ArrayMesh cannot hold the vertex at infinity')
+    if verticies is None:
+        verticies = mesh_verticies
+    else:
+        verticies = list(verticies) + [vertex for vertex in mesh_verticies
+            if vertex.artificial]
+
+    numbers = dict((vertex, i) for i, vertex in enumerate(verticies))
+    mesh = from_triangles([vertex.x for vertex in verticies],
+        [vertex.y for vertex in verticies],
+        [vertex.artificial for vertex in verticies],
+        [[numbers[vertex] for vertex in face.vertices()] for face in faces])
+    return mesh, list(verticies)
+
+
+##############################################################################
+# Testing methods
+
+
+def validate(mesh):
+    """Check the leaf faces of mesh edge by edge.
+
+    Returns a voronoi.ValidationReport, see voronoi.validate.  Faces and
+    edges in the report are face and half-edge numbers.
+
+    """
+    origin = mesh.origin
+    twin = mesh.twin
+    nxt = mesh.next
+    face = mesh.face
+    x = mesh.x
+    y = mesh.y
+
+    report = voronoi.ValidationReport()
+    for v in mesh.iter_vertices(include_artificial=True):
+        report.verticies += 1
+    for f in mesh.iter_faces():
+        report.faces += 1
+        a, b, c = mesh.vertices(f)
+        if robust.orient2d(x[a], y[a], x[b], y[b], x[c], y[c]) <= 0:
+            report.inverted.append(f)
+
+    for e in mesh.iter_edges():
+        report.edges += 1
+        if face[e] == -1 or face[twin[e]] == -1:
+            continue
+
+        # Interior edge: its face against the vertex across it.
+        a = origin[e]
+        b = origin[nxt[e]]
+        c = origin[nxt[nxt[e]]]
+        d = origin[nxt[nxt[twin[e]]]]
+        if robust.incircle(x[a], y[a], x[b], y[b], x[c], y[c], x[d],
+                y[d]) > 0:
+            report.illegal.append(e)
+    return report
+
+
+def check_triangulation(mesh):
+    """Check that the mesh is a Delauny triangulation.  See validate."""
+    report = validate(mesh)
+    assert report.ok(), str(report)
+
+
+def check_dcel(mesh):
+    """Checks the DCEL invariants."""
+    faces = list(mesh.iter_faces())
+    edges = list(mesh.iter_edges(unique=False))
+    verticies = list(mesh.iter_vertices(include_artificial=True))
+
+    def check(expression, error, *extras):
+        if not expression:
+            if extras:
+                error = '{0}: {1}'.format(error,
+                    ', '.join(str(extra) for extra in extras))
+            raise voronoi.DcelError(error)
+
+    # Check that twins are paired and border a face
+    for edge in edges:
+        check(mesh.twin[mesh.twin[edge]] == edge, 'Edge.twin', edge)
+        check(mesh.face[edge] != -1 or mesh.face[mesh.twin[edge]] != -1,
+            'Edge.face is None on both sides', edge)
+
+    # Check that all verticies have a link to an outgoing edge
+    for vertex in verticies:
+        edge = mesh.vertex_edge[vertex]
+        check(edge != -1, 'Vertex.edge is None', vertex)
+        check(mesh.origin[edge] == vertex, 'Vertex.edge', vertex, edge)
+
+    # Check that all edges make well formed loops
+    seen = set()
+    for first in edges:
+        if first in seen:
+            continue
+        seen.add(first)
+        if mesh.next[first] == -1:
+            continue
+
+        edge = mesh.next[first]
+        edge_count = 1
+        while edge != first:
+            check(edge not in seen, 'Edge.next', edge)
+            check(mesh.next[edge] != -1, 'Edge.next is None', edge)
+            edge_count += 1
+            seen.add(edge)
+            edge = mesh.next[edge]
+        check(edge_count == 3, 'triangles', edge_count)
+
+    # checks that the face edge loop all points to face
+    for face in faces:
+        first = mesh.face_edge[face]
+        edge = mesh.next[first]
+        while True:
+            check(mesh.face[edge] == face, 'Edge.face', edge, face)
+            edge = mesh.next[edge]
+            if edge == first:
+                break
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+
+"""Benchmarks for voronoi.triangulate.
+
+Run with the name of a benchmark and its arguments, for example
+
+    python bench.py legalize 20000
+    python bench.py suite 100000 > run.json
+
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy
+
+import query
+import relax
+import render
+import spatial
+import stats
+import voronoi
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def clustered(r, n, clusters=20, spread=.02):
+    """n points in [-1, 1]^2 drawn from gaussian clusters.
+
+    Points that fall outside are drawn again.  Clamping them to the border
+    would pile repeats up in the corners.
+
+    """
+    centers = [(r.uniform(-1., 1.), r.uniform(-1., 1.))
+        for i in xrange(clusters)]
+    points = []
+    for i in xrange(n):
+        cx, cy = r.choice(centers)
+        while True:
+            x = r.gauss(cx, spread)
+            y = r.gauss(cy, spread)
+            if -1. <= x <= 1. and -1. <= y <= 1.:
+                break
+        points.append(voronoi.Vertex(x, y))
+    return points
+
+
+def uniform(r, n):
+    """n points uniformly distributed in [-1, 1]^2."""
+    return [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
+        for i in xrange(n)]
+
+
+def grid(r, n):
+    """About n points on a square grid, full of cocircular points."""
+    side = max(int(math.sqrt(n)), 2)
+    step = 2. / (side - 1)
+    return [voronoi.Vertex(i * step - 1., j * step - 1.)
+        for i in xrange(side) for j in xrange(side)]
+
+
+def circle(r, n):
+    """n points on the unit circle, as close to cocircular as floats get."""
+    return [voronoi.Vertex(math.cos(a), math.sin(a))
+        for a in sorted(r.uniform(0., 2. * math.pi) for i in xrange(n))]
+
+
+def presorted(r, n):
+    """n uniform points sorted by x, the worst order for a plain insert."""
+    return sorted(uniform(r, n), key=lambda v: (v.x, v.y))
+
+
+DISTRIBUTIONS = {
+    'uniform': uniform,
+    'clustered': clustered,
+    'grid': grid,
+    'circle': circle,
+    'sorted': presorted,
+}
+
+
+def degree(vertex):
+    """The number of edges leaving vertex."""
+    count = 0
+    edge = vertex.edge
+    while True:
+        count += 1
+        edge = edge.twin.next
+        if edge is vertex.edge:
+            return count
+
+
+def bench_legalize(n=20000, seed=1):
+    """Time only the legalization step of triangulate.
+
+    Builds the mesh the way triangulate(locate='walk', order='brio') does on
+    clustered points, but times just the calls to voronoi._legalize.  Each
+    flip adds one edge to the new vertex, so the flips of one insertion are
+    its final degree less 3.
+
+    """
+    points = clustered(random.Random(seed), n)
+    points = [points[i] for i in spatial.brio_order(points)]
+
+    leaf = voronoi._make_triangle(*[voronoi.Vertex(x, y, True)
+        for x, y in voronoi._enclosing(1.)])
+    rng = random.Random(0)
+    flips = 0
+    elapsed = 0.
+    for vertex in points:
+        leaf = leaf.walk(vertex, rng)
+        triangles = leaf.split(vertex, history=False)
+        start = time.time()
+        voronoi._legalize(triangles, vertex, history=False)
+        elapsed += time.time() - start
+        flips += degree(vertex) - 3
+
+    print 'legalize: {0} points, {1} flips, {2:.3f}s'.format(n, flips,
+        elapsed)
+    print '  {0:.2f}us per flip, {1:.0f} flips/s'.format(
+        1e6 * elapsed / flips, flips / elapsed)
+
+
+def bench_kinetic(n=20000, frames=20, seed=1):
+    """Time Triangulation.update against triangulating every frame.
+
+    Every point drifts by a small random velocity each frame, the way the
+    halo animation moves its sites.
+
+    """
+    r = random.Random(seed)
+    points = [voronoi.Vertex(r.uniform(-.9, .9), r.uniform(-.9, .9))
+        for i in xrange(n)]
+    velocity = [(r.gauss(0., .0003), r.gauss(0., .0003)) for i in xrange(n)]
+    t = voronoi.Triangulation(points)
+
+    changed = 0
+    elapsed = 0.
+    for frame in xrange(frames):
+        # Bounce off the edges of the square.
+        for i, v in enumerate(points):
+            dx, dy = velocity[i]
+            if abs(v.x + dx) > 1.:
+                dx = -dx
+            if abs(v.y + dy) > 1.:
+                dy = -dy
+            velocity[i] = dx, dy
+        positions = [(v.x + dx, v.y + dy)
+            for v, (dx, dy) in zip(points, velocity)]
+        start = time.time()
+        changed += len(t.update(points, positions))
+        elapsed += time.time() - start
+
+    start = time.time()
+    voronoi.triangulate([voronoi.Vertex(v.x, v.y) for v in points], 1.,
+        locate='walk', order='brio')
+    rebuild = time.time() - start
+
+    print 'kinetic: {0} points, {1} frames'.format(n, frames)
+    print '  update {0:.3f}s per frame, {1:.0f} triangles changed'.format(
+        elapsed / frames, changed / float(frames))
+    print '  triangulate {0:.3f}s'.format(rebuild)
+
+
+def bench_query(n=20000, queries=1000000, seed=1):
+    """Time query.Locator answering a batch of uniform query points."""
+    r = random.Random(seed)
+    points = uniform(r, n)
+    t = voronoi.triangulate(points, 1., backend='array', locate='walk',
+        order='brio')
+    locator = query.Locator(t)
+    rs = numpy.random.RandomState(seed)
+    px = rs.uniform(-1., 1., queries)
+    py = rs.uniform(-1., 1., queries)
+
+    print 'query: {0} points, {1} queries'.format(n, queries)
+    for name in ('locate', 'nearest'):
+        start = time.time()
+        getattr(locator, name)(px, py)
+        elapsed = time.time() - start
+        print '  {0} {1:.3f}s, {2:.2f}M queries/s'.format(name, elapsed,
+            queries / elapsed / 1e6)
+
+
+def bench_render(n=1000, size=512, frames=10, seed=1):
+    """Time render.render filling a size by size image of n cells."""
+    r = random.Random(seed)
+    points = uniform(r, n)
+    t = voronoi.triangulate(points, 1., backend='array', locate='walk',
+        order='brio')
+
+    start = time.time()
+    for frame in xrange(frames):
+        render.render(t, size, size, offset=frame / float(frames))
+    elapsed = time.time() - start
+
+    print 'render: {0} points, {1}x{1} pixels, {2} frames'.format(n, size,
+        frames)
+    print '  {0:.3f}s per frame, {1:.2f} Mpixel/s'.format(elapsed / frames,
+        size * size * frames / elapsed / 1e6)
+
+
+def bench_relax(n=100000, iterations=20, seed=1):
+    """Time relax.relax against triangulating every iteration."""
+    r = random.Random(seed)
+    points = uniform(r, n)
+
+    start = time.time()
+    result = relax.relax(points, 0)
+    setup = time.time() - start
+    start = time.time()
+    result = relax.relax(points, iterations, mesh=result.mesh)
+    elapsed = time.time() - start
+
+    start = time.time()
+    voronoi.triangulate([voronoi.Vertex(v.x, v.y) for v in points], 1.,
+        backend='array', locate='walk', order='brio')
+    rebuild = time.time() - start
+
+    print 'relax: {0} points, {1} iterations'.format(n, iterations)
+    print '  first triangulation {0:.3f}s'.format(setup)
+    print '  {0:.3f}s per iteration, {1:.0f} flips'.format(
+        elapsed / iterations, sum(result.flips) / float(iterations))
+    print '  last shift {0:.2g}, {1} sites lagging'.format(result.shifts[-1],
+        result.lagging[-1])
+    print '  triangulate {0:.3f}s'.format(rebuild)
+
+
+# Locating points by the triangle tree takes quadratic time on sorted input
+# inserted in the order given, so bench_suite stops those runs here.
+UNORDERED_MAX_N = 10000
+
+
+def _run_case(distribution, n, seed, options, count):
+    """Triangulate one input and measure it.
+
+    Runs in a fresh process so peak memory belongs to this case alone.  With
+    count the input is triangulated a second time with a stats.Stats, so
+    its counters and phase timers do not slow the timed run.  'valid' says
+    whether voronoi.validate passed the mesh.
+
+    """
+    points = DISTRIBUTIONS[distribution](random.Random(seed), n)
+    result = dict(distribution=distribution, n=len(points), seed=seed,
+        **options)
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+    start = time.time()
+    mesh = voronoi.triangulate(points, **options)
+    result['seconds'] = time.time() - start
+    if tracemalloc is not None:
+        result['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        result['memory'] = 'tracemalloc'
+        tracemalloc.stop()
+    elif resource is not None:
+        # Only the peak of the whole process is known, which includes the
+        # interpreter, the input and whatever the parent held before the fork.
+        result['process_peak_kb'] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss
+        result['memory'] = 'ru_maxrss process peak'
+
+    result['valid'] = voronoi.validate(mesh).ok()
+
+    if count:
+        counted = stats.Stats(timers=True)
+        voronoi.triangulate([voronoi.Vertex(v.x, v.y) for v in points],
+            stats=counted, **options)
+        result.update(counted.as_dict())
+    return result
+
+
+def _revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(max_n=1000000, count=1, seed=1):
+    """Triangulate every distribution at sizes 100, 1000, ... up to max_n.
+
+    Each input is triangulated with both backends and both ways of locating
+    points, in brio order.  Sorted input is also inserted in the order
+    given, its worst case, up to UNORDERED_MAX_N points.  Prints one JSON
+    document to stdout, with the git revision so runs can be compared across
+    commits.  Progress goes to stderr.
+
+    """
+    configs = [dict(backend=backend, locate=locate, order='brio')
+        for backend in ('object', 'array') for locate in ('walk', 'dag')]
+    cases = []
+    n = 100
+    while n <= max_n:
+        for distribution in sorted(DISTRIBUTIONS):
+            runs = list(configs)
+            if distribution == 'sorted' and n <= UNORDERED_MAX_N:
+                runs += [dict(options, order=None) for options in configs]
+            for options in runs:
+                pool = multiprocessing.Pool(1)
+                try:
+                    case = pool.apply(_run_case, (distribution, n, seed,
+                        options, bool(count)))
+                finally:
+                    pool.close()
+                    pool.join()
+                print >>sys.stderr, '{0:>9} {1:>8} {2:>6} {3:>4} {4:>4} ' \
+                    '{5:8.3f}s{6}'.format(distribution, case['n'],
+                    options['backend'], options['locate'], options['order'],
+                    case['seconds'], '' if case['valid'] else ' INVALID')
+                cases.append(case)
+        n *= 10
+
+    print json.dumps(dict(revision=_revision(), python=platform.python_version(),
+        time=time.time(), cases=cases), indent=1, sort_keys=True)
+
+
+BENCHMARKS = {
+    'kinetic': bench_kinetic,
+    'legalize': bench_legalize,
+    'query': bench_query,
+    'relax': bench_relax,
+    'render': bench_render,
+    'suite': bench_suite,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print 'usage: bench.py {0} [args]'.format('|'.join(sorted(BENCHMARKS)))
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
+
+
+if __name__ == '__main__':
+    main()
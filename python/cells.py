@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+
+"""Voronoi cells of a Delauny triangulation as flat arrays.
+
+The Voronoi vertices are the circumcenters of the Delauny triangles, and the
+cell of a site is the polygon through the circumcenters of the triangles
+around it.  voronoi_cells computes each circumcenter once and lays the cells
+out the way a vertex buffer wants them.
+
+"""
+
+import math
+
+import numpy
+
+import arraymesh
+import predicates
+import voronoi
+
+
+class Cells(object):
+    """Voronoi cells in compressed sparse row layout.
+
+    'sites' is an (n, 2) array of the site of each cell.
+    'points' is an (m, 2) array of Voronoi vertices, one per Delauny
+    triangle, followed by the points closing off unbounded cells, if any.
+    'offsets' has n + 1 entries.  Cell i is the polygon through
+    points[indices[offsets[i]:offsets[i + 1]]], in counter-clockwise order.
+    'indices' is the concatenation of every cell's vertex numbers.
+
+    Cells of sites on the convex hull run out to the circumcenters of
+    triangles using the artificial vertices, which can be very far away.
+    In a mesh with a vertex at infinity they are unbounded and are cut off
+    on a circle far outside the sites and the clip region instead, see
+    _ghost_points and _close_cells.  clip_cells bounds them.
+
+    """
+    __slots__ = ['sites', 'points', 'offsets', 'indices']
+
+    def __init__(self, sites, points, offsets, indices):
+        self.sites = sites
+        self.points = points
+        self.offsets = offsets
+        self.indices = indices
+
+    def __repr__(self):
+        return 'Cells({0} sites, {1} points)'.format(len(self.sites),
+            len(self.points))
+
+    def __len__(self):
+        return len(self.sites)
+
+    def cell(self, i):
+        """The vertices of cell i as an (k, 2) array."""
+        return self.points[self.indices[self.offsets[i]:self.offsets[i + 1]]]
+
+
+def voronoi_cells(triangulation, verticies=None, clip=None):
+    """The Voronoi cells of the sites of 'triangulation'.
+
+    triangulation is anything voronoi.triangulate returns, or a
+    voronoi.Triangulation.  For an arraymesh.ArrayMesh cell i belongs to
+    input vertex i.  Otherwise the cells follow 'verticies', which defaults
+    to every input vertex in the mesh, in registry order for a Triangulation
+    and in no particular order for a Triangle.
+    If clip is given the cells are clipped to it, see clip_cells.
+
+    """
+    if isinstance(triangulation, arraymesh.ArrayMesh):
+        cells = _array_cells(triangulation)
+    else:
+        cells = _object_cells(triangulation, verticies, clip)
+    if clip is not None:
+        cells = clip_cells(cells, clip)
+    return cells
+
+
+def clip_cells(cells, clip):
+    """Clip every cell of 'cells' to a convex region.
+
+    clip is either a rectangle (xmin, ymin, xmax, ymax) or an (k, 2) array
+    of the corners of a convex polygon in counter-clockwise order.  All
+    cells are clipped against one side of the region at a time
+    (Sutherland-Hodgman), so the work is a few NumPy passes per side.
+
+    Clipped cells no longer share vertices: every cell gets its own run of
+    'points' and 'indices' simply counts up.  Cells entirely outside the
+    region become empty.
+
+    """
+    clip = _clip_polygon(clip)
+    points = cells.points[cells.indices]
+    offsets = cells.offsets
+    for i in xrange(len(clip)):
+        points, offsets = _clip_side(points, offsets, clip[i],
+            clip[(i + 1) % len(clip)])
+    return Cells(cells.sites, points, offsets,
+        numpy.arange(len(points), dtype=numpy.intp))
+
+
+def fans(cells):
+    """Triangle fans covering every cell, packed for a vertex buffer.
+
+    Returns (vertices, elements).  vertices is an (m, 4) float32 array of
+    interleaved (x, y, s, t) rows, where (x, y) is a position and (s, t) the
+    site of the cell it belongs to.  Each cell contributes its site followed
+    by its corners.  elements is a (k, 3) uint32 array of counter-clockwise
+    triangles joining the site to each side of its cell, so every cell is
+    drawn with one glDrawElements(GL_TRIANGLES) call.  Empty cells add an
+    unused vertex and no triangles.
+
+    """
+    n = len(cells)
+    counts = numpy.diff(cells.offsets)
+    owner = numpy.repeat(numpy.arange(n), counts)
+    corners = numpy.arange(len(cells.indices))
+
+    # Each cell's site goes just before its corners.
+    centers = cells.offsets[:-1] + numpy.arange(n)
+    slots = corners + owner + 1
+    vertices = numpy.empty((n + len(corners), 4), dtype=numpy.float32)
+    vertices[centers, :2] = cells.sites
+    vertices[centers, 2:] = cells.sites
+    vertices[slots, :2] = cells.points[cells.indices]
+    vertices[slots, 2:] = cells.sites[owner]
+
+    # The corner after each corner in its own cell.
+    after = corners + 1
+    full = counts > 0
+    after[cells.offsets[1:][full] - 1] = cells.offsets[:-1][full]
+
+    elements = numpy.empty((len(corners), 3), dtype=numpy.uint32)
+    elements[:, 0] = centers[owner]
+    elements[:, 1] = slots
+    elements[:, 2] = slots[after]
+    return vertices, elements
+
+
+def centroids(cells):
+    """The area and centroid of every cell.
+
+    Returns (areas, centroids), an n array and an (n, 2) array.  Each cell
+    is split into triangles fanning out from its site, and the sums are
+    taken relative to the site so they stay accurate far from the origin.
+    Empty cells have area 0 and a nan centroid.  Unclipped hull cells give
+    meaningless values.
+
+    """
+    n = len(cells)
+    counts = numpy.diff(cells.offsets)
+    owner = numpy.repeat(numpy.arange(n), counts)
+    corners = numpy.arange(len(cells.indices))
+    after = corners + 1
+    full = counts > 0
+    after[cells.offsets[1:][full] - 1] = cells.offsets[:-1][full]
+
+    p = cells.points[cells.indices] - cells.sites[owner]
+    q = p[after]
+    cross = p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0]
+    sums = numpy.zeros((n, 3))
+    if full.any():
+        starts = cells.offsets[:-1][full]
+        sums[full, 0] = numpy.add.reduceat(cross, starts)
+        sums[full, 1:] = numpy.add.reduceat((p + q) * cross[:, None], starts)
+
+    areas = sums[:, 0] / 2.
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        points = cells.sites + sums[:, 1:] / (3. * sums[:, :1])
+    points[~full] = numpy.nan
+    return areas, points
+
+
+def view(a):
+    """An array of an arraymesh.ArrayMesh as a NumPy array sharing its memory.
+
+    Writing to the view changes the mesh.  A mesh loaded by serialize.load
+    may already hold NumPy arrays, which are returned as they are.
+
+    """
+    if isinstance(a, numpy.ndarray):
+        return a
+    return numpy.frombuffer(a, dtype=a.typecode)
+
+
+def _clip_polygon(clip):
+    """The corners of a clip region given to clip_cells, as an array."""
+    clip = numpy.asarray(clip, dtype=float)
+    if clip.shape == (4,):
+        xmin, ymin, xmax, ymax = clip
+        clip = numpy.array([(xmin, ymin), (xmax, ymin), (xmax, ymax),
+            (xmin, ymax)])
+    return clip
+
+
+def _clip_side(points, offsets, p0, p1):
+    """Clip the polygons points[offsets[i]:offsets[i + 1]] to the left of
+    the line from p0 to p1.
+
+    """
+    n = len(points)
+    if not n:
+        return points, offsets
+
+    # The vertex after each vertex in its own polygon.
+    after = numpy.arange(1, n + 1)
+    counts = numpy.diff(offsets)
+    full = counts > 0
+    after[offsets[1:][full] - 1] = offsets[:-1][full]
+
+    dx, dy = p1 - p0
+    side = dx * (points[:, 1] - p0[1]) - dy * (points[:, 0] - p0[0])
+    inside = side >= 0
+    crossing = inside != inside[after]
+
+    # Each vertex emits itself if it is inside, then the crossing point if
+    # the edge to the next vertex leaves or enters the region.
+    emitted = inside.astype(numpy.intp) + crossing
+    ends = numpy.cumsum(emitted)
+    out = numpy.empty((ends[-1], 2))
+    keep = numpy.flatnonzero(inside)
+    out[ends[keep] - emitted[keep]] = points[keep]
+
+    cross = numpy.flatnonzero(crossing)
+    s0 = side[cross]
+    s1 = side[after[cross]]
+    t = s0 / (s0 - s1)
+    q0 = points[cross]
+    q1 = points[after[cross]]
+    out[ends[cross] - 1] = q0 + t[:, None] * (q1 - q0)
+
+    new_offsets = numpy.zeros_like(offsets)
+    new_offsets[1:] = numpy.concatenate(([0], ends))[offsets[1:]]
+    return out, new_offsets
+
+
+def _array_cells(mesh):
+    origin = view(mesh.origin)
+    twin = view(mesh.twin)
+    nxt = view(mesh.next)
+    face = view(mesh.face)
+
+    leaves = numpy.flatnonzero(view(mesh.children)[::3] == -1)
+    number = numpy.empty(len(mesh.face_edge), dtype=numpy.intp)
+    number[leaves] = numpy.arange(len(leaves))
+    triples = view(mesh.corners).reshape(-1, 3)[leaves]
+    points = predicates.circumcenters(mesh.x, mesh.y, triples)
+
+    sites = numpy.flatnonzero(view(mesh.artificial) == 0)
+    degree = numpy.bincount(origin, minlength=len(mesh.x))[sites]
+    offsets = numpy.zeros(len(sites) + 1, dtype=numpy.intp)
+    numpy.cumsum(degree, out=offsets[1:])
+
+    # Turn every site's edge counter-clockwise in step, one face per pass.
+    turn = twin[nxt[nxt]]
+    indices = numpy.empty(offsets[-1], dtype=numpy.intp)
+    edge = view(mesh.vertex_edge)[sites]
+    for k in xrange(degree.max() if len(sites) else 0):
+        live = numpy.flatnonzero(degree > k)
+        indices[offsets[live] + k] = number[face[edge[live]]]
+        edge[live] = turn[edge[live]]
+
+    xy = numpy.column_stack((view(mesh.x)[sites], view(mesh.y)[sites]))
+    return Cells(xy, points, offsets, indices)
+
+
+def _ghost_points(edges, center, radius):
+    """Stand-ins for the circumcenters of faces using the vertex at infinity.
+
+    edges are the hull edges of the hull faces, see voronoi._hull_edge.  The
+    Voronoi edge between the two sites of a hull edge is a ray along the
+    outward normal.  Each hull face gets the point where its ray leaves the
+    circle of the given radius around center.  The circle must hold the
+    start of every ray.
+
+    """
+    points = numpy.empty((len(edges), 2))
+    for i, edge in enumerate(edges):
+        a = edge.origin
+        b = edge.next.origin
+        length = math.hypot(b.x - a.x, b.y - a.y)
+        # The ghost face lies left of a -> b, outside the hull.
+        nx = (a.y - b.y) / length
+        ny = (b.x - a.x) / length
+        mx = (a.x + b.x) / 2.
+        my = (a.y + b.y) / 2.
+        ox = mx - center[0]
+        oy = my - center[1]
+        along = ox * nx + oy * ny
+        t = -along + math.sqrt(along * along - (ox * ox + oy * oy -
+            radius * radius))
+        points[i] = mx + nx * t, my + ny * t
+    return points
+
+
+def _close_cells(points, ghost, loops, center, radius):
+    """Close the unbounded hull cells along the circle of _ghost_points.
+
+    Each cell with two stand-ins next to each other gets points on the
+    circle between them, at most a quarter turn apart, so the edges of the
+    cell stay at least radius / sqrt(2) from center.  loops are lists of
+    point numbers and are extended in place.  Returns points with the new
+    points appended.
+
+    """
+    extra = []
+    for loop in loops:
+        k = len(loop)
+        for j in xrange(k):
+            if ghost[loop[j]] and ghost[loop[(j + 1) % k]]:
+                break
+        else:
+            continue
+        px, py = points[loop[j]] - center
+        qx, qy = points[loop[(j + 1) % k]] - center
+        first = math.atan2(py, px)
+        sweep = (math.atan2(qy, qx) - first) % (2. * math.pi)
+        # The rays of a cell are less than a half turn apart, so a sweep of
+        # nearly a full turn is rounding of one that is nearly nothing.
+        if sweep > 1.5 * math.pi:
+            sweep = 0.
+        steps = int(math.ceil(sweep / (.5 * math.pi)))
+        arc = []
+        for step in xrange(1, steps):
+            angle = first + sweep * step / steps
+            arc.append(len(points) + len(extra))
+            extra.append((center[0] + radius * math.cos(angle),
+                center[1] + radius * math.sin(angle)))
+        loop[j + 1:j + 1] = arc
+    if extra:
+        points = numpy.concatenate((points, extra))
+    return points
+
+
+def _around(vertex, face_number):
+    """The numbers of the faces around vertex, counter-clockwise."""
+    numbers = []
+    edge = vertex.edge
+    while True:
+        numbers.append(face_number(edge.face))
+        edge = edge.next.next.twin
+        if edge is vertex.edge:
+            return numbers
+
+
+def _object_cells(triangle, verticies, clip=None):
+    if isinstance(triangle, voronoi.Triangulation):
+        # Registry indices number the faces and vertices.
+        faces = list(triangle.iter_faces())
+        coords = triangle.verticies
+        face_number = lambda face: face.data.index
+        vertex_number = lambda vertex: vertex.index
+        if verticies is None:
+            verticies = list(triangle.iter_vertices())
+    else:
+        faces = list(triangle.iter_faces())
+        numbers = dict((face, i) for i, face in enumerate(faces))
+        face_number = numbers.__getitem__
+        coords = list(triangle.iter_vertices(include_artificial=True))
+        numbers = dict((vertex, i) for i, vertex in enumerate(coords))
+        vertex_number = numbers.__getitem__
+        if verticies is None:
+            verticies = [vertex for vertex in coords if not vertex.artificial]
+
+    # The vertex at infinity, if any, becomes nan.
+    x = numpy.array([vertex.x for vertex in coords], dtype=float)
+    y = numpy.array([vertex.y for vertex in coords], dtype=float)
+    triples = [[vertex_number(vertex) for vertex in face.data.vertices()]
+        for face in faces]
+    points = predicates.circumcenters(x, y, triples)
+    loops = [_around(vertex, face_number) for vertex in verticies]
+
+    ghost = numpy.array([face.data.is_ghost() for face in faces], dtype=bool)
+    if ghost.any():
+        # Hull cells are cut off on a circle around the sites that holds
+        # every Voronoi vertex of a hull cell, and the clip region if there
+        # is one, well inside.
+        finite = ~numpy.isnan(x)
+        center = numpy.array([x[finite].min() + x[finite].max(),
+            y[finite].min() + y[finite].max()]) / 2.
+        extent = max(numpy.ptp(x[finite]), numpy.ptp(y[finite])) or 1.
+        edges = [voronoi._hull_edge(faces[i].data)
+            for i in numpy.flatnonzero(ghost)]
+        hull = [f for edge in edges for f in _around(edge.origin, face_number)
+            if not ghost[f]]
+        radius = max(1e3 * extent,
+            2. * numpy.hypot(*(points[hull] - center).T).max())
+        if clip is not None:
+            corners = _clip_polygon(clip)
+            radius = max(radius,
+                2. * numpy.hypot(*(corners - center).T).max())
+        points[ghost] = _ghost_points(edges, center, radius)
+        points = _close_cells(points, ghost, loops, center, radius)
+
+    offsets = numpy.cumsum([0] + [len(loop) for loop in loops])
+    indices = [f for loop in loops for f in loop]
+
+    sites = numpy.array([(vertex.x, vertex.y) for vertex in verticies],
+        dtype=float).reshape(-1, 2)
+    return Cells(sites, points, offsets.astype(numpy.intp),
+        numpy.array(indices, dtype=numpy.intp))
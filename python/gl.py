@@ -1,12 +1,18 @@
 #!/usr/bin/env python
 
+import Queue
+import atexit
+import ctypes
 import math
+import multiprocessing
 import sys
 import random
 
+import numpy
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
+import cells
 import voronoi
 
 vertex_shader_source = """
@@ -33,8 +39,10 @@ void main() {
 """
 
 program = 0
+cell_buffers = None
 def init():
-    global program
+    global program, cell_buffers
+    cell_buffers = glGenBuffers(2)
     program = glCreateProgram()
     vertex = glCreateShader(GL_VERTEX_SHADER)
     glShaderSource(vertex, vertex_shader_source)
@@ -60,21 +68,25 @@ def good_face(face):
             break
     return not bad
 
-def draw_circle(x, y, r):
-    glBegin(GL_LINE_LOOP)
-    for i in xrange(128):
-        ang = i * math.pi / 64
-        glVertex(r * math.cos(ang) + x, r * math.sin(ang) + y)
-    glEnd()
-
-def draw_dcel(face):
-    edges = face.edge_set()
+# A unit circle, scaled into place for each circle drawn.
+angles = numpy.arange(128) * (math.pi / 64)
+unit_circle = numpy.column_stack((numpy.cos(angles),
+    numpy.sin(angles))).astype(numpy.float32)
 
+def draw_circle(x, y, r):
+    glPushMatrix()
+    glTranslate(x, y, 0)
+    glScale(r, r, 1)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 0, unit_circle)
+    glDrawArrays(GL_LINE_LOOP, 0, len(unit_circle))
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glPopMatrix()
+
+def draw_dcel(mesh):
     if False:
         glColor(0, 0, 1)
-        faces = set(edge.face for edge in edges)
-        faces.discard(None)
-        for face in faces:
+        for face in mesh.iter_faces():
             if good_face(face):
                 x, y, r = face.data.circle()
                 draw_circle(x, y, r)
@@ -82,7 +94,7 @@ def draw_dcel(face):
     if False:
         glColor(0, 0, 1)
         glBegin(GL_LINES)
-        for edge in edges:
+        for edge in mesh.iter_edges():
             lhs = edge.face
             rhs = edge.twin.face
             if not edge.origin.artificial and not edge.twin.origin.artificial:
@@ -99,13 +111,11 @@ def draw_dcel(face):
     if False:
         glColor(0, 0, 0)
         glBegin(GL_POINTS)
-        for edge in edges:
-            glVertex(edge.origin.x, edge.origin.y)
+        for vertex in mesh.iter_vertices():
+            glVertex(vertex.x, vertex.y)
         if True:
             glColor(0, 0, 1)
-            faces = set(edge.face for edge in edges)
-            faces.discard(None)
-            for face in faces:
+            for face in mesh.iter_faces():
                 if good_face(face):
                     x, y = face.data.circumcenter()
                     glVertex(x, y)
@@ -114,7 +124,7 @@ def draw_dcel(face):
 
     if False:
         glBegin(GL_LINES)
-        for edge in edges:
+        for edge in mesh.iter_edges():
             glColor(0, 0, 0)
             if not edge.origin.artificial and not edge.twin.origin.artificial:
                 glVertex(edge.origin.x, edge.origin.y)
@@ -122,6 +132,11 @@ def draw_dcel(face):
         glEnd()
 
 seed = 74
+points = []
+mesh = None
+# Set to draw the debugging overlays in draw_dcel.  The overlay needs a mesh
+# in this process, so it is triangulated here when new points arrive.
+show_dcel = False
 def paint():
     glClearColor(.7, .2, .2, 1.)
     glClear(GL_COLOR_BUFFER_BIT)
@@ -134,52 +149,120 @@ def paint():
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-    global seed
-    r = random.Random(seed)
-    # print 'seed =', seed
-    # seed += 1
+    global points, mesh
+    # Swap in the newest cells the worker has finished, if any.  Until the
+    # first ones arrive there is nothing to draw.
+    latest = None
+    try:
+        while True:
+            latest = results.get_nowait()
+    except Queue.Empty:
+        pass
+    if latest is not None:
+        points, vertices, elements = latest
+        upload_cells(vertices, elements)
+        mesh = None
+
+    triangles()
+
+    if show_dcel and points:
+        if mesh is None:
+            mesh = voronoi.Triangulation([voronoi.Vertex(x, y)
+                for x, y in points], max_coord=1)
+        draw_dcel(mesh)
 
-    points = [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
-        for i in xrange(25)]
+    glutSwapBuffers()
+    # glutPostRedisplay()
 
-    t = voronoi.triangulate(points, max_coord=1)
-    
-    triangles(points)
+requests = None
+results = None
+worker = None
+def cell_worker(requests, results):
+    """Triangulate in the background for paint.
 
-    draw_dcel(t.get_face())
+    Takes seeds from requests and puts (points, vertices, elements) on
+    results, with the cells packed by cells.fans.  Seeds that were replaced
+    by a newer one before the worker got to them are skipped.  A seed of None
+    stops the worker.
 
-    glutSwapBuffers()
-    # glutPostRedisplay()
+    """
+    while True:
+        seed = requests.get()
+        try:
+            while True:
+                seed = requests.get_nowait()
+        except Queue.Empty:
+            pass
+        if seed is None:
+            return
+
+        r = random.Random(seed)
+        points = [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
+            for i in xrange(25)]
+        t = voronoi.Triangulation(points, max_coord=1)
+        # Only the part of each cell on screen needs filling.
+        vertices, elements = cells.fans(cells.voronoi_cells(t, points,
+            clip=(-1, -1, 1, 1)))
+        results.put(([(v.x, v.y) for v in points], vertices, elements))
+
+def start_worker():
+    global requests, results, worker
+    requests = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=cell_worker,
+        args=(requests, results))
+    worker.daemon = True
+    worker.start()
+    atexit.register(stop_worker)
+    requests.put(seed)
+
+def stop_worker():
+    """Stop the worker when the viewer exits."""
+    requests.put(None)
+    worker.join()
 
 which = 0
-def triangles(points):
-    
-    color = .3
+element_count = 0
+def upload_cells(vertices, elements):
+    """Copy cells packed by cells.fans into the cell buffers.
+
+    Only needed when the topology changes, each frame just draws them.
+
+    """
+    global element_count
+    glBindBuffer(GL_ARRAY_BUFFER, cell_buffers[0])
+    glBufferData(GL_ARRAY_BUFFER, vertices, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, cell_buffers[1])
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, elements, GL_STATIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    element_count = elements.size
+
+def triangles():
 
     import time
     now = time.time()
     offset = 1 * (now - int(now))
     glutPostRedisplay()
+    if not element_count:
+        return
 
     glUseProgram(program)
     glUniform1f(glGetUniformLocation(program, "offset"), offset)
 
-    # for vertex in points[which:which + 1]:
-    for vertex in points:
-        glTexCoord(vertex.x, vertex.y)
-        glBegin(GL_TRIANGLE_FAN)
-        glColor(color, color, color)
-        color += .7 / (len(points) - 1)
-        glVertex(vertex.x, vertex.y)
-        edge = vertex.edge
-        while True:
-            # assert edge.origin is vertex
-            glVertex(*edge.face.data.circumcenter())
-            edge = edge.twin.next
-            if edge is vertex.edge:
-                break
-        glVertex(*edge.face.data.circumcenter())
-        glEnd()
+    # Rows are (x, y, s, t) float32, the texture coordinate is the site.
+    glBindBuffer(GL_ARRAY_BUFFER, cell_buffers[0])
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, cell_buffers[1])
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 16, ctypes.c_void_p(0))
+    glTexCoordPointer(2, GL_FLOAT, 16, ctypes.c_void_p(8))
+    glDrawElements(GL_TRIANGLES, element_count, GL_UNSIGNED_INT,
+        ctypes.c_void_p(0))
+    glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
     glUseProgram(0)
 
 def resize(width, height):
@@ -191,7 +274,7 @@ def keyboard(key, x, y):
     elif True:
         global seed
         seed += 1
-        glutPostRedisplay()
+        requests.put(seed)
     else:
         global which
         which += 1
@@ -200,6 +283,8 @@ def keyboard(key, x, y):
         glutPostRedisplay()
 
 def main():
+    # Start the worker before there is a GL context to inherit.
+    start_worker()
     glutInit(sys.argv)
     glutInitDisplayMode(GLUT_RGBA | GLUT_DEPTH | GLUT_DOUBLE)
     glutInitWindowSize(768, 768)
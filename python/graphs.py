@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""Neighbour graphs of the sites, read off a Delauny triangulation.
+
+The Delauny edges contain the Euclidean minimum spanning tree and the
+nearest neighbour graph, and the k nearest neighbours of a site can be found
+by searching outwards along the edges from the site.  So none of these need
+to look at every pair of sites.
+
+The enclosing triangle is far enough out that every edge these searches
+need is present, as long as the sites lie within max_coord of the origin.
+
+"""
+
+import heapq
+
+import numpy
+
+import arraymesh
+import cells
+
+
+class Graph(object):
+    """The Delauny edges between input vertices.
+
+    'mesh' and 'verticies' are as for query.Locator: 'mesh' is the
+    arraymesh.ArrayMesh whose vertex numbers the results use, and
+    'verticies' holds the voronoi.Vertex behind each number when the
+    triangulation was an object mesh.
+    'sites' is the vertex numbers of the input vertices.
+    'edges' is an (m, 2) array with one row per edge.
+    'offsets' and 'neighbours' are the adjacency lists in compressed sparse
+    row layout: the neighbours of vertex v are
+    neighbours[offsets[v]:offsets[v + 1]].
+
+    """
+
+    def __init__(self, triangulation):
+        if isinstance(triangulation, arraymesh.ArrayMesh):
+            self.mesh = triangulation
+            self.verticies = None
+        else:
+            self.mesh, self.verticies = arraymesh.from_voronoi(triangulation)
+
+        mesh = self.mesh
+        self.x = cells.view(mesh.x)
+        self.y = cells.view(mesh.y)
+        artificial = cells.view(mesh.artificial) != 0
+        self.sites = numpy.flatnonzero(~artificial)
+
+        origin = cells.view(mesh.origin)
+        twin = cells.view(mesh.twin)
+        # Half-edges come in pairs, so the first of each pair stands for the
+        # edge.
+        e = numpy.arange(0, len(origin), 2)
+        a = origin[e]
+        b = origin[twin[e]]
+        keep = ~artificial[a] & ~artificial[b]
+        self.edges = numpy.column_stack((a[keep], b[keep]))
+
+        both = numpy.concatenate((self.edges, self.edges[:, ::-1]))
+        both = both[numpy.argsort(both[:, 0], kind='mergesort')]
+        self.neighbours = both[:, 1].copy()
+        self.offsets = numpy.zeros(len(self.x) + 1, dtype=numpy.intp)
+        numpy.cumsum(numpy.bincount(both[:, 0], minlength=len(self.x)),
+            out=self.offsets[1:])
+        # Plain lists of the arrays for the searches, made when needed.
+        # Python loops index lists much faster than arrays.
+        self._lists = None
+
+    def lengths(self):
+        """The length of each row of 'edges'."""
+        a, b = self.edges.T
+        return numpy.hypot(self.x[a] - self.x[b], self.y[a] - self.y[b])
+
+    def spanning_tree(self):
+        """The Euclidean minimum spanning tree as an (n - 1, 2) edge array.
+
+        Kruskal's algorithm over the Delauny edges.
+
+        """
+        parent = range(len(self.x))
+
+        def find(v):
+            root = v
+            while parent[root] != root:
+                root = parent[root]
+            while parent[v] != root:
+                parent[v], v = root, parent[v]
+            return root
+
+        tree = []
+        wanted = len(self.sites) - 1
+        edges = self.edges.tolist()
+        for i in numpy.argsort(self.lengths(), kind='mergesort').tolist():
+            a, b = edges[i]
+            ra = find(a)
+            rb = find(b)
+            if ra != rb:
+                parent[ra] = rb
+                tree.append(i)
+                if len(tree) == wanted:
+                    break
+        return self.edges[numpy.array(tree, dtype=numpy.intp)].reshape(-1, 2)
+
+    def nearest(self, k, sites=None):
+        """The k nearest other sites of each site, nearest first.
+
+        sites is an array of vertex numbers and defaults to 'sites'.  Returns
+        a (len(sites), k) array.  Rows are padded with -1 if there are not
+        enough other sites.
+
+        """
+        if sites is None:
+            sites = self.sites
+        found = numpy.empty((len(sites), k), dtype=numpy.intp)
+        found.fill(-1)
+        for row, v in enumerate(numpy.asarray(sites).tolist()):
+            near = self._search(v, k, None)
+            found[row, :len(near)] = near
+        return found
+
+    def within(self, radius, sites=None):
+        """The other sites within radius of each site, nearest first.
+
+        sites is an array of vertex numbers and defaults to 'sites'.  Returns
+        (offsets, indices) in compressed sparse row layout: the sites near
+        sites[i] are indices[offsets[i]:offsets[i + 1]].
+
+        """
+        if sites is None:
+            sites = self.sites
+        offsets = [0]
+        indices = []
+        for v in numpy.asarray(sites).tolist():
+            indices.extend(self._search(v, None, radius * radius))
+            offsets.append(len(indices))
+        return (numpy.array(offsets, dtype=numpy.intp),
+            numpy.array(indices, dtype=numpy.intp))
+
+    def _search(self, v, k, limit):
+        """The sites nearest v in order, visiting them best first.
+
+        Each site found is next to v or to a site found before it in the
+        Delauny graph, so only the neighbours of found sites are candidates.
+        Stops after k sites or at squared distance limit.
+
+        """
+        if self._lists is None:
+            self._lists = (self.x.tolist(), self.y.tolist(),
+                self.offsets.tolist(), self.neighbours.tolist())
+        x, y, offsets, neighbours = self._lists
+        vx = x[v]
+        vy = y[v]
+
+        found = []
+        seen = set((v,))
+        heap = []
+        w = v
+        while True:
+            for u in neighbours[offsets[w]:offsets[w + 1]]:
+                if u not in seen:
+                    seen.add(u)
+                    dx = x[u] - vx
+                    dy = y[u] - vy
+                    heapq.heappush(heap, (dx * dx + dy * dy, u))
+            if not heap or len(found) == k:
+                return found
+            d, w = heapq.heappop(heap)
+            if limit is not None and d > limit:
+                return found
+            found.append(w)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+"""Delauny triangulation split across a pool of processes.
+
+The points are sorted by x and cut into vertical strips, one per worker.
+Each worker triangulates its strip on its own.  A triangle whose circumcircle
+lies well inside its strip cannot contain a point of any other strip, so it
+is part of the final triangulation.  The points touching any other triangle
+form the seam.  The main process triangulates just the seam and fills the
+space between the kept triangles with it.
+
+"""
+
+import multiprocessing
+
+import arraymesh
+import voronoi
+
+# Strips with fewer points than this are mostly seam, so there is no point
+# in splitting that finely.
+MIN_STRIP = 50
+
+
+def triangulate_parallel(verticies, workers=None, max_coord=None,
+        backend='object'):
+    """Compute the Delauny triangulation of 'verticies' using several processes.
+
+    workers is the number of processes, or None for one per CPU.  max_coord
+    and backend are as for voronoi.triangulate.  The mesh is the same one
+    voronoi.triangulate(locate='walk') builds: a leaf triangle is returned
+    for the 'object' backend and an arraymesh.ArrayMesh for 'array'.  In
+    either case the vertices of the enclosing triangle follow the input.
+
+    """
+    if backend not in ('object', 'array'):
+        raise ValueError('unknown backend {0!r}'.format(backend))
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if max_coord is None:
+        max_coord = 0
+        for vertex in verticies:
+            max_coord = max(max_coord, abs(vertex.x), abs(vertex.y))
+
+    n = len(verticies)
+    strips = min(workers, n // MIN_STRIP)
+    if strips < 2:
+        return _serial(verticies, max_coord, backend)
+
+    jobs = _strip_jobs(verticies, strips, max_coord)
+    pool = multiprocessing.Pool(min(workers, strips))
+    try:
+        results = pool.map(_triangulate_strip, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    triangles = []
+    seam = []
+    for strip_triangles, strip_seam in results:
+        triangles.extend(strip_triangles)
+        seam.extend(strip_seam)
+
+    filled = _fill_seam(verticies, seam, triangles, max_coord)
+    if filled is None or len(triangles) + len(filled) != 2 * n + 1:
+        # Cocircular points can make the seam triangulation choose different
+        # edges than the strips did.
+        return _serial(verticies, max_coord, backend)
+    triangles.extend(filled)
+
+    corners = voronoi._enclosing(max_coord)
+    if backend == 'array':
+        x = [vertex.x for vertex in verticies] + [cx for cx, cy in corners]
+        y = [vertex.y for vertex in verticies] + [cy for cx, cy in corners]
+        artificial = [False] * n + [True] * 3
+        return arraymesh.from_triangles(x, y, artificial, triangles)
+
+    verticies = list(verticies) + [voronoi.Vertex(cx, cy, True)
+        for cx, cy in corners]
+    return voronoi.from_triangles(verticies, triangles)
+
+
+def _serial(verticies, max_coord, backend):
+    return voronoi.triangulate(verticies, max_coord, backend, locate='walk',
+        order='brio')
+
+
+def _strip_jobs(verticies, strips, max_coord):
+    """Cut verticies into x-sorted strips for _triangulate_strip.
+
+    Neighbouring strips are separated at the midpoint of the gap between
+    them.
+
+    """
+    n = len(verticies)
+    indices = sorted(xrange(n), key=lambda i: verticies[i].x)
+    bounds = [n * k // strips for k in xrange(strips + 1)]
+
+    jobs = []
+    for k in xrange(strips):
+        chunk = indices[bounds[k]:bounds[k + 1]]
+        if k == 0:
+            lo = float('-inf')
+        else:
+            lo = (verticies[indices[bounds[k] - 1]].x +
+                verticies[chunk[0]].x) / 2.
+        if k == strips - 1:
+            hi = float('inf')
+        else:
+            hi = (verticies[chunk[-1]].x +
+                verticies[indices[bounds[k + 1]]].x) / 2.
+        points = [(verticies[i].x, verticies[i].y) for i in chunk]
+        jobs.append((chunk, points, lo, hi, max_coord))
+    return jobs
+
+
+def _triangulate_strip(job):
+    """Triangulate one strip.
+
+    Returns the triangles known to be in the full triangulation and the
+    points of the seam, both as indices into the full input.
+
+    """
+    indices, points, lo, hi, max_coord = job
+    mesh = voronoi.triangulate([voronoi.Vertex(x, y) for x, y in points],
+        max_coord, backend='array', locate='walk', order='brio')
+
+    m = len(indices)
+    x = mesh.x
+    y = mesh.y
+    triangles = []
+    seam = set()
+    for f in mesh.leaves():
+        a, b, c = mesh.vertices(f)
+        if (a < m and b < m and c < m and
+                _inside_slab(x[a], y[a], x[b], y[b], x[c], y[c], lo, hi,
+                max_coord)):
+            triangles.append((indices[a], indices[b], indices[c]))
+        else:
+            seam.update(v for v in (a, b, c) if v < m)
+    return triangles, [indices[v] for v in seam]
+
+
+def _inside_slab(ax, ay, bx, by, cx, cy, lo, hi, max_coord):
+    """True if the circumcircle of abc is well inside lo < x < hi."""
+    bx -= ax
+    by -= ay
+    cx -= ax
+    cy -= ay
+    d = 2. * (bx * cy - by * cx)
+    if d == 0:
+        return False
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (cy * b2 - by * c2) / d
+    uy = (bx * c2 - cx * b2) / d
+    r = (ux * ux + uy * uy) ** .5
+    # Allow for rounding in the circumcircle.
+    margin = 1e-9 * (max_coord + r)
+    return lo + margin < ax + ux - r and ax + ux + r < hi - margin
+
+
+def _fill_seam(verticies, seam, triangles, max_coord):
+    """The triangles covering the space between 'triangles'.
+
+    Triangulates the seam points and keeps the faces reachable from the
+    boundary of 'triangles' without crossing into it.  Returns None if the
+    seam triangulation does not fit that boundary.
+
+    """
+    n = len(verticies)
+    mesh = voronoi.triangulate([verticies[i] for i in seam], max_coord,
+        backend='array', locate='walk', order='brio')
+    # Map seam mesh vertices back to the input, with the enclosing triangle
+    # after it.
+    index = list(seam) + [n, n + 1, n + 2]
+
+    kept = set()
+    for a, b, c in triangles:
+        kept.update(((a, b), (b, c), (c, a)))
+
+    face_of = {}
+    origin = mesh.origin
+    twin = mesh.twin
+    for f in mesh.leaves():
+        a, b, c = [index[v] for v in mesh.vertices(f)]
+        face_of[a, b] = face_of[b, c] = face_of[c, a] = f
+
+    seen = set()
+    for a, b in kept:
+        if (b, a) not in kept:
+            if (b, a) not in face_of:
+                return None
+            seen.add(face_of[b, a])
+    if not triangles:
+        seen.update(mesh.leaves())
+
+    working = list(seen)
+    filled = []
+    while working:
+        f = working.pop()
+        corners = tuple(index[v] for v in mesh.vertices(f))
+        filled.append(corners)
+        edge = start = mesh.face_edge[f]
+        while True:
+            a = index[origin[edge]]
+            b = index[origin[twin[edge]]]
+            g = mesh.face[twin[edge]]
+            if (b, a) not in kept and g != -1 and g not in seen:
+                seen.add(g)
+                working.append(g)
+            edge = mesh.next[edge]
+            if edge == start:
+                break
+    return filled
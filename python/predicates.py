@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+"""Geometric predicates evaluated over whole arrays at once.
+
+The methods on voronoi.Triangle and arraymesh.ArrayMesh evaluate one
+determinant per call.  The functions here take coordinate arrays and arrays
+of vertex indices and evaluate every row in a single NumPy expression, which
+suits bulk work such as validating a finished mesh or locating many points.
+
+Like the scalar predicates in robust, each row is first evaluated in
+floating point with an error bound.  The few rows whose sign cannot be
+trusted are evaluated again exactly, so every sign agrees with robust.
+
+"""
+
+import numpy
+
+import robust
+
+
+def orient2d(x, y, triples):
+    """Twice the signed area of each triangle in 'triples'.
+
+    x, y are the vertex coordinates.  triples is an (n, 3) array of vertex
+    indices.  A row is positive if its vertices are in counter-clockwise
+    order, negative if clockwise and 0 if they are collinear.
+
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    triples = numpy.asarray(triples, dtype=numpy.intp).reshape(-1, 3)
+    a, b, c = triples.T
+
+    detleft = (x[a] - x[c]) * (y[b] - y[c])
+    detright = (y[a] - y[c]) * (x[b] - x[c])
+    det = detleft - detright
+
+    bound = robust.CCW_BOUND * (abs(detleft) + abs(detright))
+    for i in numpy.flatnonzero(abs(det) < bound):
+        det[i] = _sign_float(robust.orient2d_exact(x[a[i]], y[a[i]],
+            x[b[i]], y[b[i]], x[c[i]], y[c[i]]))
+    return det
+
+
+def incircle(x, y, quads):
+    """The incircle determinant of each row (a, b, c, d) of 'quads'.
+
+    x, y are the vertex coordinates.  quads is an (n, 4) array of vertex
+    indices.  A row is positive if d is inside the circle through a, b and
+    c, which must be in counter-clockwise order.
+
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    quads = numpy.asarray(quads, dtype=numpy.intp).reshape(-1, 4)
+    a, b, c, d = quads.T
+
+    adx = x[a] - x[d]
+    bdx = x[b] - x[d]
+    cdx = x[c] - x[d]
+    ady = y[a] - y[d]
+    bdy = y[b] - y[d]
+    cdy = y[c] - y[d]
+
+    bdxcdy = bdx * cdy
+    cdxbdy = cdx * bdy
+    alift = adx * adx + ady * ady
+
+    cdxady = cdx * ady
+    adxcdy = adx * cdy
+    blift = bdx * bdx + bdy * bdy
+
+    adxbdy = adx * bdy
+    bdxady = bdx * ady
+    clift = cdx * cdx + cdy * cdy
+
+    det = (alift * (bdxcdy - cdxbdy) + blift * (cdxady - adxcdy) +
+        clift * (adxbdy - bdxady))
+
+    permanent = ((abs(bdxcdy) + abs(cdxbdy)) * alift +
+        (abs(cdxady) + abs(adxcdy)) * blift +
+        (abs(adxbdy) + abs(bdxady)) * clift)
+    bound = robust.ICC_BOUND * permanent
+    for i in numpy.flatnonzero(abs(det) <= bound):
+        det[i] = _sign_float(robust.incircle_exact(x[a[i]], y[a[i]],
+            x[b[i]], y[b[i]], x[c[i]], y[c[i]], x[d[i]], y[d[i]]))
+    return det
+
+
+def points_orient2d(x, y, edges, px, py):
+    """Which side of each edge the matching query point is on.
+
+    edges is an (n, 2) array of vertex indices (origin, target) and px, py
+    are n query points.  A row is positive if the point is to the left of
+    its edge.  This is the test used to walk many query points through a
+    mesh at once.
+
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    px = numpy.asarray(px, dtype=float)
+    py = numpy.asarray(py, dtype=float)
+    edges = numpy.asarray(edges, dtype=numpy.intp).reshape(-1, 2)
+    o, t = edges.T
+
+    detleft = (x[o] - px) * (y[t] - py)
+    detright = (y[o] - py) * (x[t] - px)
+    det = detleft - detright
+
+    bound = robust.CCW_BOUND * (abs(detleft) + abs(detright))
+    for i in numpy.flatnonzero(abs(det) < bound):
+        det[i] = _sign_float(robust.orient2d_exact(x[o[i]], y[o[i]],
+            x[t[i]], y[t[i]], px[i], py[i]))
+    return det
+
+
+def circumcenters(x, y, triples):
+    """The circumcenter of each triangle in 'triples' as an (n, 2) array.
+
+    x, y are the vertex coordinates.  triples is an (n, 3) array of vertex
+    indices.  The centers are computed relative to the first vertex of each
+    row, which keeps them accurate for small triangles far from the origin.
+    Collinear rows give inf or nan.
+
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    triples = numpy.asarray(triples, dtype=numpy.intp).reshape(-1, 3)
+    a, b, c = triples.T
+
+    bx = x[b] - x[a]
+    by = y[b] - y[a]
+    cx = x[c] - x[a]
+    cy = y[c] - y[a]
+    d = 2. * (bx * cy - by * cx)
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+
+    centers = numpy.empty((len(triples), 2))
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        centers[:, 0] = x[a] + (cy * b2 - by * c2) / d
+        centers[:, 1] = y[a] + (bx * c2 - cx * b2) / d
+    return centers
+
+
+def circumradii(x, y, triples):
+    """The circumradius of each triangle in 'triples'."""
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    triples = numpy.asarray(triples, dtype=numpy.intp).reshape(-1, 3)
+    centers = circumcenters(x, y, triples)
+    a = triples[:, 0]
+    return numpy.hypot(centers[:, 0] - x[a], centers[:, 1] - y[a])
+
+
+def areas(x, y, triples):
+    """The signed area of each triangle in 'triples'.
+
+    Positive for counter-clockwise rows.  This is half of orient2d, without
+    the exact fallback.
+
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    triples = numpy.asarray(triples, dtype=numpy.intp).reshape(-1, 3)
+    a, b, c = triples.T
+    return .5 * ((x[b] - x[a]) * (y[c] - y[a]) -
+        (y[b] - y[a]) * (x[c] - x[a]))
+
+
+def _sign_float(value):
+    """A float with the same sign as the exact value.
+
+    Tiny values are kept away from 0 so the sign survives the conversion.
+
+    """
+    if value > 0:
+        return max(float(value), _TINY)
+    if value < 0:
+        return min(float(value), -_TINY)
+    return 0.
+
+
+_TINY = 5e-324
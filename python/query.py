@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+"""Point location and nearest site queries in bulk.
+
+A Locator answers whole arrays of query points against a finished
+triangulation, so the sites double as a lookup structure without building a
+separate tree.  Queries are sorted along a Hilbert curve and each one walks
+the mesh from the answer of a query before it on the curve.  All the walks
+of a batch advance together, one NumPy step at a time.
+
+"""
+
+import numpy
+
+import arraymesh
+import cells
+import predicates
+import spatial
+
+
+class Locator(object):
+    """Batch queries against one triangulation.
+
+    'mesh' is the arraymesh.ArrayMesh the answers refer to.  For an ArrayMesh
+    this is the triangulation itself.  Object meshes are converted with
+    arraymesh.from_voronoi, and 'verticies' then holds the voronoi.Vertex
+    behind each vertex number.  It is None for an ArrayMesh.
+
+    """
+
+    def __init__(self, triangulation):
+        if isinstance(triangulation, arraymesh.ArrayMesh):
+            self.mesh = triangulation
+            self.verticies = None
+        else:
+            self.mesh, self.verticies = arraymesh.from_voronoi(triangulation)
+
+        mesh = self.mesh
+        self.x = cells.view(mesh.x)
+        self.y = cells.view(mesh.y)
+        self.artificial = cells.view(mesh.artificial) != 0
+        self.vertex_edge = cells.view(mesh.vertex_edge)
+        self.origin = cells.view(mesh.origin)
+        self.twin = cells.view(mesh.twin)
+        self.next = cells.view(mesh.next)
+        self.face = cells.view(mesh.face)
+        self.face_edge = cells.view(mesh.face_edge)
+        self.corners = cells.view(mesh.corners).reshape(-1, 3)
+        # Turns an edge counter-clockwise around its origin.
+        self.turn = self.twin[self.next[self.next]]
+        # The input vertices joined to an artificial vertex.
+        ends = self.origin[self.twin[numpy.flatnonzero(
+            self.artificial[self.origin])]]
+        self.boundary = numpy.unique(ends[~self.artificial[ends]])
+        self.on_boundary = numpy.zeros(len(self.x), dtype=bool)
+        self.on_boundary[self.boundary] = True
+        # Walks start from the last answer of the previous batch.
+        self.hint = next(mesh.leaves())
+
+    def locate(self, px, py):
+        """The leaf face containing each query point (px[i], py[i]).
+
+        Points on an edge may be given either face.  Points outside the
+        enclosing triangle get -1.
+
+        """
+        px = numpy.asarray(px, dtype=float).ravel()
+        py = numpy.asarray(py, dtype=float).ravel()
+        order = _curve_order(px, py)
+        faces = numpy.empty(len(px), dtype=numpy.intp)
+        faces[order] = self._locate_sorted(px[order], py[order])
+        return faces
+
+    def nearest(self, px, py):
+        """The input vertex nearest to each query point (px[i], py[i]).
+
+        Returns vertex numbers of 'mesh', or -1 for every query if the mesh
+        has no input vertices.  Of sites at the same distance any one may be
+        chosen.
+
+        """
+        px = numpy.asarray(px, dtype=float).ravel()
+        py = numpy.asarray(py, dtype=float).ravel()
+        sites = numpy.flatnonzero(~self.artificial)
+        if not len(sites):
+            return -numpy.ones(len(px), dtype=numpy.intp)
+        order = _curve_order(px, py)
+        qx = px[order]
+        qy = py[order]
+
+        # Start from the nearest input corner of the containing face.
+        faces = self._locate_sorted(qx, qy)
+        start = numpy.empty(len(qx), dtype=numpy.intp)
+        start.fill(sites[0])
+        best = numpy.empty(len(qx))
+        best.fill(numpy.inf)
+        inside = numpy.flatnonzero(faces != -1)
+        for corner in self.corners[faces[inside]].T:
+            d = self._distance(corner, qx[inside], qy[inside])
+            closer = ~self.artificial[corner] & (d < best[inside])
+            start[inside[closer]] = corner[closer]
+            best[inside[closer]] = d[closer]
+
+        found = numpy.empty(len(px), dtype=numpy.intp)
+        found[order] = self._descend(start, qx, qy)
+        return found
+
+    def _distance(self, v, qx, qy):
+        dx = self.x[v] - qx
+        dy = self.y[v] - qy
+        return dx * dx + dy * dy
+
+    def _locate_sorted(self, qx, qy):
+        """locate for queries already in curve order.
+
+        Query 0 walks from the hint.  Then, halving the stride each round,
+        the queries at odd multiples of the stride walk from the answer one
+        stride back, which the previous rounds found.
+
+        """
+        n = len(qx)
+        faces = numpy.empty(n, dtype=numpy.intp)
+        if not n:
+            return faces
+        faces[:1] = self._walk(numpy.array([self.hint]), qx[:1], qy[:1])
+
+        stride = 1
+        while stride * 2 < n:
+            stride *= 2
+        while stride:
+            queries = numpy.arange(stride, n, 2 * stride)
+            start = faces[queries - stride]
+            # A query outside the mesh leaves its successors nothing to
+            # walk from.
+            start[start == -1] = self.hint
+            faces[queries] = self._walk(start, qx[queries], qy[queries])
+            stride //= 2
+
+        if faces[-1] != -1:
+            self.hint = faces[-1]
+        return faces
+
+    def _walk(self, faces, qx, qy):
+        """Walk every query from its start face to the face containing it.
+
+        Each step crosses an edge the query is to the right of.  In a
+        Delauny triangulation this cannot cycle.
+
+        """
+        origin = self.origin
+        nxt = self.next
+        faces = faces.copy()
+        active = numpy.arange(len(faces))
+        while len(active):
+            e0 = self.face_edge[faces[active]]
+            e1 = nxt[e0]
+            e2 = nxt[e1]
+            px = qx[active]
+            py = qy[active]
+            crossing = numpy.empty(len(active), dtype=numpy.intp)
+            crossing.fill(-1)
+            for e in (e2, e1, e0):
+                side = predicates.points_orient2d(self.x, self.y,
+                    numpy.column_stack((origin[e], origin[nxt[e]])), px, py)
+                crossing = numpy.where(side < 0, e, crossing)
+
+            moving = crossing != -1
+            active = active[moving]
+            faces[active] = self.face[self.twin[crossing[moving]]]
+            active = active[faces[active] != -1]
+        return faces
+
+    def _descend(self, start, qx, qy):
+        """Greedy search of the Delauny graph from each start vertex.
+
+        Each query checks the neighbours of its vertex in turn and moves to
+        the first input vertex closer than the vertex itself.  A vertex with
+        no closer neighbour is the nearest site, unless it is on the
+        boundary.
+
+        The mesh holds the Delauny triangulation of the input vertices
+        except for edges the enclosing triangle cut.  Both ends of those
+        are joined to an artificial vertex, since inserting a vertex only
+        removes edges between vertices it gets joined to.  So a query stuck
+        on the boundary, as queries outside the hull of the sites can be,
+        moves to the nearest boundary vertex if that is closer and carries
+        on from there.
+
+        """
+        v = start.copy()
+        best = self._distance(v, qx, qy)
+        active = numpy.arange(len(v))
+        while len(active):
+            self._greedy(v, best, active, qx, qy)
+            stuck = active[self.on_boundary[v[active]]]
+            w, d = self._nearest_boundary(qx[stuck], qy[stuck])
+            closer = d < best[stuck]
+            active = stuck[closer]
+            v[active] = w[closer]
+            best[active] = d[closer]
+        return v
+
+    def _greedy(self, v, best, active, qx, qy):
+        """Move the queries active down the mesh edges, see _descend.
+
+        v and best hold the vertex of each query and its squared distance,
+        and are updated in place.
+
+        """
+        edge = numpy.empty(len(v), dtype=numpy.intp)
+        edge[active] = self.vertex_edge[v[active]]
+        stop = edge.copy()
+        while len(active):
+            spoke = edge[active]
+            w = self.origin[self.twin[spoke]]
+            d = self._distance(w, qx[active], qy[active])
+            closer = ~self.artificial[w] & (d < best[active])
+
+            moved = active[closer]
+            v[moved] = w[closer]
+            best[moved] = d[closer]
+            edge[moved] = stop[moved] = self.vertex_edge[w[closer]]
+
+            turned = active[~closer]
+            edge[turned] = self.turn[spoke[~closer]]
+            turned = turned[edge[turned] != stop[turned]]
+            active = numpy.concatenate((moved, turned))
+
+    def _nearest_boundary(self, qx, qy):
+        """The nearest boundary vertex to each query and its squared
+        distance, by brute force.
+
+        """
+        boundary = self.boundary
+        w = numpy.empty(len(qx), dtype=numpy.intp)
+        d = numpy.empty(len(qx))
+        # Keep the distance matrix of each chunk to about a million entries.
+        chunk = max(1, 1000000 // max(len(boundary), 1))
+        for i in xrange(0, len(qx), chunk):
+            distance = (self.x[boundary] - qx[i:i + chunk, None]) ** 2 + \
+                (self.y[boundary] - qy[i:i + chunk, None]) ** 2
+            nearest = distance.argmin(axis=1)
+            w[i:i + chunk] = boundary[nearest]
+            d[i:i + chunk] = distance[numpy.arange(len(nearest)), nearest]
+        return w, d
+
+
+def _curve_order(px, py):
+    """The permutation sorting the points along a Hilbert curve.
+
+    Coordinates are scaled to the bounding box of the points.  The grid is
+    only fine enough to hold a few points per cell on average, which is all
+    the locality the walks need.
+
+    """
+    n = len(px)
+    if not n:
+        return numpy.arange(0)
+    bits = min(max((n.bit_length() + 1) // 2 + 2, 4), 16)
+    min_x = px.min()
+    min_y = py.min()
+    extent = max(px.max() - min_x, py.max() - min_y)
+    scale = ((1 << bits) - 1) / extent if extent > 0 else 0.
+    keys = spatial.hilbert_indices(((px - min_x) * scale).astype(numpy.int64),
+        ((py - min_y) * scale).astype(numpy.int64), bits)
+    return numpy.argsort(keys)
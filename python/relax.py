@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+"""Lloyd relaxation: move every site to the centroid of its Voronoi cell.
+
+Repeating this spreads the sites out evenly, towards a centroidal Voronoi
+tessellation, which makes the halo cells look alike.  After the first few
+iterations the sites only move a little, so instead of triangulating again
+every iteration relax moves the vertices of one arraymesh.ArrayMesh in place
+and flips the edges that stopped being legal, much like
+voronoi.Triangulation.update.  A site that would turn a triangle over moves
+part of the way instead.
+
+"""
+
+import numpy
+
+import cells
+import predicates
+import voronoi
+
+# How many times relax tries to move the sites of one iteration, halving the
+# steps of the sites that keep turning triangles over.
+ATTEMPTS = 16
+
+
+class Relaxation(object):
+    """What relax did.
+
+    'mesh' is the arraymesh.ArrayMesh of the final sites.  Input vertex i is
+    mesh vertex i.
+    'shifts' is the largest distance any site moved in each iteration.
+    'flips' is the number of edges flipped to repair the mesh in each
+    iteration.
+    'lagging' is the number of sites left short of their centroid in each
+    iteration.  They carry on from there in the next one.
+    'converged' is true if relax stopped because no site moved further than
+    the tolerance.
+
+    """
+    __slots__ = ['mesh', 'shifts', 'flips', 'lagging', 'converged']
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.shifts = []
+        self.flips = []
+        self.lagging = []
+        self.converged = False
+
+    def __repr__(self):
+        return 'Relaxation({0} iterations, {1})'.format(len(self.shifts),
+            'converged' if self.converged else 'not converged')
+
+
+def relax(verticies, iterations, bounds=(-1., -1., 1., 1.), tolerance=0.,
+        mesh=None):
+    """Lloyd relaxation of verticies inside the rectangle bounds.
+
+    Each iteration clips the Voronoi cells to bounds, given as (xmin, ymin,
+    xmax, ymax), and moves every site to the centroid of its clipped cell.
+    Sites whose cells miss bounds stay where they are.  relax stops after
+    'iterations' iterations, or sooner once no site has to move further than
+    tolerance.  The vertices are moved in place and a Relaxation is
+    returned.
+
+    mesh is an ArrayMesh of verticies without a triangle tree to start from,
+    such as the 'mesh' of an earlier Relaxation.  By default relax
+    triangulates them first.  Duplicate vertices are not allowed.
+
+    """
+    bounds = tuple(float(value) for value in bounds)
+    if mesh is None:
+        mesh = _triangulate(verticies, bounds)
+    result = Relaxation(mesh)
+    n = len(verticies)
+
+    for i in xrange(iterations):
+        c = cells.voronoi_cells(mesh, clip=bounds)
+        areas, targets = cells.centroids(c)
+        stay = ~numpy.isfinite(targets).all(axis=1) | (areas <= 0)
+        targets[stay] = c.sites[stay]
+
+        shift = numpy.hypot(*(targets - c.sites).T).max() if n else 0.
+
+        # Sites that would turn a triangle over wait until the others have
+        # moved and the mesh is repaired.  Then they try again, with shorter
+        # steps while none of them gets anywhere.  A short enough step always
+        # works, since a vertex can move anywhere inside its star.
+        pending = numpy.flatnonzero(~stay)
+        fraction = 1.
+        flips = 0
+        for attempt in xrange(ATTEMPTS):
+            if not len(pending):
+                break
+            steps = targets[pending]
+            if fraction < 1.:
+                start = numpy.column_stack((cells.view(mesh.x)[pending],
+                    cells.view(mesh.y)[pending]))
+                steps = start + fraction * (steps - start)
+            held = _move(mesh, pending, steps)
+            flips += _repair(mesh, numpy.setdiff1d(pending, held))
+            progress = len(held) < len(pending)
+            if fraction == 1.:
+                pending = held
+            fraction = 1. if progress else fraction / 2.
+        result.shifts.append(shift)
+        result.flips.append(flips)
+        result.lagging.append(len(pending))
+        if shift <= tolerance:
+            result.converged = True
+            break
+
+    x = cells.view(mesh.x)[:n].tolist()
+    y = cells.view(mesh.y)[:n].tolist()
+    for j, vertex in enumerate(verticies):
+        vertex.x = x[j]
+        vertex.y = y[j]
+    return result
+
+
+def _triangulate(verticies, bounds):
+    """An ArrayMesh of verticies whose enclosing triangle also holds bounds.
+
+    Sites only move towards centroids inside bounds, so they never leave
+    the enclosing triangle.
+
+    """
+    max_coord = max(abs(value) for value in bounds)
+    for vertex in verticies:
+        max_coord = max(max_coord, abs(vertex.x), abs(vertex.y))
+    return voronoi.triangulate(verticies, max_coord, backend='array',
+        locate='walk', order='brio')
+
+
+def _move(mesh, verts, targets):
+    """Move the vertices verts of mesh to the rows of targets.
+
+    One moved vertex of each face that would be turned over is put back,
+    over and over until no face is.  The mesh was valid with every vertex
+    back, so this stops.  Returns the vertices that were put back.
+
+    """
+    x = cells.view(mesh.x)
+    y = cells.view(mesh.y)
+    old_x = x.copy()
+    old_y = y.copy()
+    x[verts] = targets[:, 0]
+    y[verts] = targets[:, 1]
+
+    corners = cells.view(mesh.corners).reshape(-1, 3)
+    moved = numpy.zeros(len(x), dtype=bool)
+    moved[verts] = True
+    held = numpy.zeros(len(x), dtype=bool)
+    check = moved
+    while True:
+        faces = _around(corners, check)
+        inverted = corners[faces[predicates.orient2d(x, y,
+            corners[faces]) <= 0]]
+        back = numpy.unique(numpy.where(moved[inverted], inverted, -1).max(
+            axis=1))
+        if not len(back):
+            return numpy.flatnonzero(held)
+        moved[back] = False
+        held[back] = True
+        x[back] = old_x[back]
+        y[back] = old_y[back]
+        check = numpy.zeros(len(x), dtype=bool)
+        check[back] = True
+
+
+def _around(corners, marked):
+    """The faces with a corner marked in the boolean vertex array marked."""
+    return numpy.flatnonzero(marked[corners[:, 0]] | marked[corners[:, 1]] |
+        marked[corners[:, 2]])
+
+
+def _repair(mesh, verts):
+    """Make mesh Delauny again after the vertices verts moved.
+
+    Only the edges of faces around verts can have stopped being legal.
+    They are tested all at once and the illegal ones are flipped with a
+    stack as in voronoi._lawson.  No face may be turned over.  Returns the
+    number of flips.
+
+    """
+    x = cells.view(mesh.x)
+    y = cells.view(mesh.y)
+    origin = cells.view(mesh.origin)
+    twin = cells.view(mesh.twin)
+    nxt = cells.view(mesh.next)
+    face = cells.view(mesh.face)
+    touched = numpy.zeros(len(x), dtype=bool)
+    touched[verts] = True
+    faces = _around(cells.view(mesh.corners).reshape(-1, 3), touched)
+    e = cells.view(mesh.face_edge)[faces]
+    e = numpy.concatenate((e, nxt[e], nxt[nxt[e]]))
+    e = e[face[twin[e]] != -1]
+    quads = numpy.column_stack((origin[e], origin[nxt[e]],
+        origin[nxt[nxt[e]]], origin[nxt[nxt[twin[e]]]]))
+    stack = e[predicates.incircle(x, y, quads) > 0].tolist()
+
+    flips = 0
+    origin = mesh.origin
+    twin = mesh.twin
+    nxt = mesh.next
+    face = mesh.face
+    while stack:
+        edge = stack.pop()
+        pair = twin[edge]
+        if face[pair] == -1:
+            continue
+        v = origin[nxt[nxt[edge]]]
+        if not mesh.incircle(face[pair], v):
+            continue
+        around = (nxt[edge], nxt[nxt[edge]], nxt[pair], nxt[nxt[pair]])
+        mesh.flip(face[edge], v, history=False)
+        flips += 1
+        stack.extend(around)
+    return flips
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""The halo effect drawn in software, without a GL context.
+
+render produces the same picture as the fragment shader in gl.py: each
+pixel belongs to the cell of its nearest site and gets a grey level from a
+ring pattern around that site.  The image is filled one tile at a time.
+Only the cells whose bounding box touches a tile can own its pixels, so
+each tile measures the distance from its pixels to a handful of sites in a
+single NumPy expression.
+
+"""
+
+import numpy
+
+import cells
+
+# Pixels on a side of the square tiles render fills at once.
+TILE = 32
+
+
+def render(triangulation, width, height, offset=0., verticies=None,
+        view=(-1., -1., 1., 1.), tile=TILE):
+    """Render the halo effect into a (height, width) float32 array.
+
+    triangulation and verticies give the sites, as for cells.voronoi_cells.
+    view is the rectangle (xmin, ymin, xmax, ymax) covered by the image,
+    with row 0 at the top as on screen; the default matches the window in
+    gl.py.  offset moves the rings like the shader's 'offset' uniform.
+    Values are between 0 and 1.  Pixels with no site are 0.
+
+    """
+    xmin, ymin, xmax, ymax = view
+    c = cells.voronoi_cells(triangulation, verticies, clip=view)
+    lo, hi = _bounds(c, 1e-9 * max(abs(value) for value in view))
+
+    px = xmin + (numpy.arange(width) + .5) * ((xmax - xmin) / float(width))
+    py = ymax - (numpy.arange(height) + .5) * ((ymax - ymin) / float(height))
+    image = numpy.zeros((height, width), dtype=numpy.float32)
+    for top in xrange(0, height, tile):
+        ty = py[top:top + tile]
+        rows = (lo[:, 1] <= ty[0]) & (hi[:, 1] >= ty[-1])
+        for left in xrange(0, width, tile):
+            tx = px[left:left + tile]
+            near = numpy.flatnonzero(rows & (lo[:, 0] <= tx[-1]) &
+                (hi[:, 0] >= tx[0]))
+            if not len(near):
+                continue
+            dx = tx[None, :, None] - c.sites[near, 0]
+            dy = ty[:, None, None] - c.sites[near, 1]
+            distance = numpy.sqrt((dx * dx + dy * dy).min(axis=2))
+            image[top:top + tile, left:left + tile] = rings(distance, offset)
+    return image
+
+
+def rings(distance, offset=0.):
+    """The shader's grey level at each distance from a site."""
+    c = 10. * distance - offset
+    c = numpy.abs((c - numpy.floor(c)) * 2. - 1.)
+    t = numpy.clip((c - .45) / .1, 0., 1.)
+    return t * t * (3. - 2. * t)
+
+
+def save_pgm(image, path):
+    """Write an image from render as an 8 bit binary PGM file."""
+    height, width = image.shape
+    data = numpy.clip(image * 255. + .5, 0, 255).astype(numpy.uint8)
+    with open(path, 'wb') as f:
+        f.write('P5\n{0} {1}\n255\n'.format(width, height))
+        f.write(data.tostring())
+
+
+def _bounds(c, margin):
+    """The corners of the bounding box of every cell of c, grown by margin.
+
+    Empty cells get boxes that overlap nothing.
+
+    """
+    n = len(c)
+    lo = numpy.empty((n, 2))
+    hi = numpy.empty((n, 2))
+    lo.fill(numpy.inf)
+    hi.fill(-numpy.inf)
+    full = numpy.diff(c.offsets) > 0
+    if full.any():
+        # Clipped cells own consecutive runs of points.
+        corners = c.points[c.indices]
+        starts = c.offsets[:-1][full]
+        lo[full] = numpy.minimum.reduceat(corners, starts) - margin
+        hi[full] = numpy.maximum.reduceat(corners, starts) + margin
+    return lo, hi
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""Adaptive exact orientation and incircle predicates.
+
+Each predicate first evaluates its determinant in floating point along with
+a bound on the rounding error, following Shewchuk, "Adaptive Precision
+Floating-Point Arithmetic and Fast Robust Geometric Predicates".  Only when
+the determinant is too close to 0 for its sign to be trusted is it
+evaluated again in exact rational arithmetic.
+
+The value returned always has the correct sign.  It is a float when the
+filter succeeds and a fractions.Fraction otherwise, so callers should only
+compare it against 0.
+
+"""
+
+from fractions import Fraction
+
+EPSILON = 2. ** -53
+
+CCW_BOUND = (3. + 16. * EPSILON) * EPSILON
+ICC_BOUND = (10. + 96. * EPSILON) * EPSILON
+
+
+def orient2d(ax, ay, bx, by, cx, cy):
+    """Positive if a, b, c are in counter-clockwise order.
+
+    Negative if they are clockwise and 0 if they are collinear.  The value
+    is twice the signed area of the triangle abc.
+
+    """
+    detleft = (ax - cx) * (by - cy)
+    detright = (ay - cy) * (bx - cx)
+    det = detleft - detright
+
+    if detleft > 0:
+        if detright <= 0:
+            return det
+        detsum = detleft + detright
+    elif detleft < 0:
+        if detright >= 0:
+            return det
+        detsum = -detleft - detright
+    else:
+        return det
+
+    bound = CCW_BOUND * detsum
+    if det >= bound or -det >= bound:
+        return det
+    return orient2d_exact(ax, ay, bx, by, cx, cy)
+
+
+def orient2d_exact(ax, ay, bx, by, cx, cy):
+    """orient2d evaluated in exact arithmetic."""
+    ax, ay, bx, by, cx, cy = [Fraction(c) for c in (ax, ay, bx, by, cx, cy)]
+    return (ax - cx) * (by - cy) - (ay - cy) * (bx - cx)
+
+
+def incircle(ax, ay, bx, by, cx, cy, dx, dy):
+    """Positive if d is inside the circle through a, b and c.
+
+    a, b and c must be in counter-clockwise order.  Negative if d is outside
+    the circle and 0 if it is on it.
+
+    """
+    adx = ax - dx
+    bdx = bx - dx
+    cdx = cx - dx
+    ady = ay - dy
+    bdy = by - dy
+    cdy = cy - dy
+
+    bdxcdy = bdx * cdy
+    cdxbdy = cdx * bdy
+    alift = adx * adx + ady * ady
+
+    cdxady = cdx * ady
+    adxcdy = adx * cdy
+    blift = bdx * bdx + bdy * bdy
+
+    adxbdy = adx * bdy
+    bdxady = bdx * ady
+    clift = cdx * cdx + cdy * cdy
+
+    det = (alift * (bdxcdy - cdxbdy) + blift * (cdxady - adxcdy) +
+        clift * (adxbdy - bdxady))
+
+    permanent = ((abs(bdxcdy) + abs(cdxbdy)) * alift +
+        (abs(cdxady) + abs(adxcdy)) * blift +
+        (abs(adxbdy) + abs(bdxady)) * clift)
+    bound = ICC_BOUND * permanent
+    if det > bound or -det > bound:
+        return det
+    return incircle_exact(ax, ay, bx, by, cx, cy, dx, dy)
+
+
+def incircle_exact(ax, ay, bx, by, cx, cy, dx, dy):
+    """incircle evaluated in exact arithmetic."""
+    ax, ay, bx, by, cx, cy, dx, dy = [Fraction(c)
+        for c in (ax, ay, bx, by, cx, cy, dx, dy)]
+    adx = ax - dx
+    bdx = bx - dx
+    cdx = cx - dx
+    ady = ay - dy
+    bdy = by - dy
+    cdy = cy - dy
+
+    alift = adx * adx + ady * ady
+    blift = bdx * bdx + bdy * bdy
+    clift = cdx * cdx + cdy * cdy
+
+    return (alift * (bdx * cdy - cdx * bdy) + blift * (cdx * ady - adx * cdy) +
+        clift * (adx * bdy - bdx * ady))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""Save triangulations to a flat binary file and load them back.
+
+A triangulation is stored as the arrays of an arraymesh.ArrayMesh, one after
+another behind a small header.  Everything is little-endian and every array
+starts on an 8 byte boundary, so loading can map the file and hand out NumPy
+views of it without reading or converting anything.
+
+The layout, version 1:
+
+    header      magic 'HALOMESH', uint32 version, uint32 reserved,
+                uint64 vertices, half-edges, faces and order length
+    x, y        float64 per vertex
+    artificial  int8 per vertex
+    vertex_edge int64 per vertex
+    origin, twin, next, face
+                int64 per half-edge
+    face_edge   int64 per face
+    corners     int64, three per face
+    children    int64, three per face
+    order       int64 per entry
+
+"""
+
+import struct
+
+import numpy
+
+import arraymesh
+import cells
+
+MAGIC = 'HALOMESH'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sI4xQQQQ')
+
+# (name, dtype, entries per item, which count).
+_LAYOUT = [
+    ('x', '<f8', 1, 'vertices'),
+    ('y', '<f8', 1, 'vertices'),
+    ('artificial', '<i1', 1, 'vertices'),
+    ('vertex_edge', '<i8', 1, 'vertices'),
+    ('origin', '<i8', 1, 'edges'),
+    ('twin', '<i8', 1, 'edges'),
+    ('next', '<i8', 1, 'edges'),
+    ('face', '<i8', 1, 'edges'),
+    ('face_edge', '<i8', 1, 'faces'),
+    ('corners', '<i8', 3, 'faces'),
+    ('children', '<i8', 3, 'faces'),
+    ('order', '<i8', 1, 'order'),
+]
+
+
+def save(triangulation, path, verticies=None):
+    """Write a triangulation to the file 'path'.
+
+    triangulation is anything voronoi.triangulate returns, or a
+    voronoi.Triangulation.  An arraymesh.ArrayMesh is written as it is,
+    triangle tree included, and its 'order' is the insertion order.  Object
+    meshes are converted by arraymesh.from_voronoi first and keep only their
+    leaf faces.  Pass the input verticies to number their vertices by
+    position in the list; 'order' then lists the input vertices by number,
+    since object meshes do not keep their insertion order.
+
+    """
+    if isinstance(triangulation, arraymesh.ArrayMesh):
+        mesh = triangulation
+    else:
+        mesh, verticies = arraymesh.from_voronoi(triangulation, verticies)
+
+    counts = dict(vertices=len(mesh.x), edges=len(mesh.origin),
+        faces=len(mesh.face_edge), order=len(mesh.order))
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, counts['vertices'],
+            counts['edges'], counts['faces'], counts['order']))
+        for name, dtype, width, count in _LAYOUT:
+            data = cells.view(getattr(mesh, name)).astype(dtype)
+            assert len(data) == width * counts[count]
+            f.write(data.tostring())
+            f.write('\0' * (-data.nbytes % 8))
+
+
+def load(path, mmap=True):
+    """Read a triangulation written by save as an arraymesh.ArrayMesh.
+
+    With mmap the file is mapped and the mesh's arrays are read-only NumPy
+    views of it, so loading takes no time and pages are only read when they
+    are used.  Such a mesh can be queried, for instance with find_leaf, walk
+    or cells.voronoi_cells, but not changed.  Without mmap the file is read
+    into the usual array.array storage and the mesh can be edited.
+
+    Raises ValueError if the file is not a triangulation or has a version
+    this module cannot read.
+
+    """
+    if mmap:
+        # A plain ndarray over the map: indexing a numpy.memmap can give
+        # read-only copies.
+        data = numpy.memmap(path, dtype=numpy.uint8, mode='r').view(
+            numpy.ndarray)
+    else:
+        data = numpy.fromfile(path, dtype=numpy.uint8)
+
+    if len(data) < _HEADER.size:
+        raise ValueError('{0}: not a triangulation'.format(path))
+    magic, version, vertices, edges, faces, order = _HEADER.unpack(
+        data[:_HEADER.size].tostring())
+    if magic != MAGIC:
+        raise ValueError('{0}: not a triangulation'.format(path))
+    if version != VERSION:
+        raise ValueError('{0}: unsupported version {1}'.format(path,
+            version))
+    counts = dict(vertices=vertices, edges=edges, faces=faces, order=order)
+
+    mesh = arraymesh.ArrayMesh()
+    offset = _HEADER.size
+    for name, dtype, width, count in _LAYOUT:
+        size = width * counts[count]
+        nbytes = size * numpy.dtype(dtype).itemsize
+        if offset + nbytes > len(data):
+            raise ValueError('{0}: truncated'.format(path))
+        view = data[offset:offset + nbytes].view(dtype)
+        if not mmap:
+            storage = getattr(mesh, name)
+            storage.fromstring(view.astype(storage.typecode).tostring())
+        else:
+            setattr(mesh, name, view)
+        offset += nbytes + (-nbytes % 8)
+    return mesh
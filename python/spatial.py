@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""Spatially coherent orderings of point sets.
+
+Inserting points that are close together one after the other keeps point
+location walks short and keeps the part of the mesh being modified small.
+
+"""
+
+import random
+
+
+def hilbert_index(x, y, bits=16):
+    """Position of the integer point (x, y) along a Hilbert curve.
+
+    x and y must be in [0, 2**bits).
+
+    """
+    d = 0
+    s = 1 << (bits - 1)
+    while s:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve inside it has the base orientation.
+        if not ry:
+            if rx:
+                x = s - 1 - (x & (s - 1))
+                y = s - 1 - (y & (s - 1))
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def hilbert_indices(ix, iy, bits=16):
+    """hilbert_index over arrays of integer points, as a NumPy array."""
+    # Imported here so the rest of the module works without NumPy.
+    import numpy
+    ix = numpy.array(ix, dtype=numpy.int64)
+    iy = numpy.array(iy, dtype=numpy.int64)
+    d = numpy.zeros(ix.shape, dtype=numpy.int64)
+    s = 1 << (bits - 1)
+    while s:
+        rx = (ix & s) != 0
+        ry = (iy & s) != 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve inside it has the base orientation.
+        # Only the bits below s matter from here on, so flipping them is an
+        # exclusive or and the swap is the usual exclusive or swap.
+        flip = (rx & ~ry) * (s - 1)
+        ix ^= flip
+        iy ^= flip
+        swap = (ix ^ iy) * ~ry
+        ix ^= swap
+        iy ^= swap
+        s >>= 1
+    return d
+
+
+def hilbert_keys(verticies, indices, bits=16):
+    """Hilbert curve keys of verticies[i] for each i in indices.
+
+    Coordinates are scaled to the bounding box of the selected verticies.
+
+    """
+    if not indices:
+        return []
+    xs = [verticies[i].x for i in indices]
+    ys = [verticies[i].y for i in indices]
+    min_x = min(xs)
+    min_y = min(ys)
+    extent = max(max(xs) - min_x, max(ys) - min_y)
+    scale = ((1 << bits) - 1) / float(extent) if extent > 0 else 0.
+    return [hilbert_index(int((x - min_x) * scale), int((y - min_y) * scale),
+        bits) for x, y in zip(xs, ys)]
+
+
+def hilbert_sort(verticies, indices=None, bits=16):
+    """Indices of verticies sorted along a Hilbert curve.
+
+    If indices is given only those verticies are sorted.
+
+    """
+    if indices is None:
+        indices = range(len(verticies))
+    keys = hilbert_keys(verticies, indices, bits)
+    return [i for key, i in sorted(zip(keys, indices))]
+
+
+def brio_order(verticies, rng=None):
+    """A Biased Randomized Insertion Order for verticies.
+
+    Each vertex lands in the last round with probability 1/2, in the round
+    before with probability 1/4, and so on.  Rounds are inserted smallest
+    first and each round is sorted along a Hilbert curve over the bounding
+    box of the whole input.  The randomness keeps the expected cost of the
+    incremental algorithm low, and the sorting gives locality.
+
+    Returns a permutation: the i'th vertex to insert is
+    verticies[order[i]].
+
+    """
+    if rng is None:
+        rng = random.Random(0)
+
+    n = len(verticies)
+    last = max(n.bit_length() - 1, 0)
+    rounds = [[] for i in xrange(last + 1)]
+    for i in xrange(n):
+        level = 0
+        while level < last and rng.random() < .5:
+            level += 1
+        rounds[level].append(i)
+
+    keys = hilbert_keys(verticies, range(n))
+    order = []
+    for level in reversed(rounds):
+        order.extend(sorted(level, key=keys.__getitem__))
+    return order
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""Opt-in counters for voronoi.triangulate.
+
+Pass a Stats to triangulate to see where a slow input spends its time.
+Without one triangulate skips every counter and clock read.
+
+"""
+
+import time
+
+
+def _zero():
+    return 0.
+
+
+class Stats(object):
+    """Counters, histograms and timers collected while triangulating.
+
+    'insertions' is the number of vertices inserted.
+    'locate_steps' is the total work of point location: levels descended in
+    the triangle tree, or triangles entered by a walk.
+    'child_misses' counts children tested while descending the tree that
+    did not contain the vertex.
+    'incircle' counts incircle tests made while legalizing.
+    'flips' counts edge flips.
+
+    'location' and 'cascade' are histograms, dictionaries from the location
+    steps or the flips of one insertion to the number of insertions that
+    took that many.
+
+    'timers' is None unless timers was true.  Then it holds the seconds
+    spent in each phase of insertion: 'location', 'split' and 'legalize'.
+    Timing every insertion costs a few clock reads each, so it is off by
+    default.
+
+    """
+
+    def __init__(self, timers=False):
+        self.insertions = 0
+        self.locate_steps = 0
+        self.child_misses = 0
+        self.incircle = 0
+        self.flips = 0
+        self.location = {}
+        self.cascade = {}
+        if timers:
+            self.timers = {'location': 0., 'split': 0., 'legalize': 0.}
+            self.clock = time.time
+        else:
+            self.timers = None
+            self.clock = _zero
+        self._flips = 0
+
+    def __str__(self):
+        lines = ['{0} insertions, {1} locate steps, {2} child misses, '
+            '{3} incircle tests, {4} flips'.format(self.insertions,
+            self.locate_steps, self.child_misses, self.incircle, self.flips)]
+        for name in ('location', 'cascade'):
+            histogram = getattr(self, name)
+            lines.append('{0}: {1}'.format(name, ' '.join('{0}:{1}'.format(
+                key, histogram[key]) for key in sorted(histogram))))
+        if self.timers is not None:
+            lines.append('timers: ' + ', '.join('{0} {1:.3f}s'.format(phase,
+                self.timers[phase]) for phase in sorted(self.timers)))
+        return '\n'.join(lines)
+
+    def as_dict(self):
+        """The collected numbers as plain dictionaries, for json."""
+        return dict(insertions=self.insertions,
+            locate_steps=self.locate_steps, child_misses=self.child_misses,
+            incircle=self.incircle, flips=self.flips,
+            location=dict(self.location), cascade=dict(self.cascade),
+            timers=self.timers)
+
+    def located(self, steps, misses=0):
+        """Record the point location of one vertex."""
+        self.locate_steps += steps
+        self.child_misses += misses
+        self.location[steps] = self.location.get(steps, 0) + 1
+
+    def legalized(self, tests, flips):
+        """Record a run of legalization for the current vertex."""
+        self.incircle += tests
+        self.flips += flips
+        self._flips += flips
+
+    def inserted(self, start, located, split, end):
+        """Finish recording one vertex.
+
+        The arguments are readings of 'clock' taken before location, after
+        location, after the split and after legalization.
+
+        """
+        self.insertions += 1
+        self.cascade[self._flips] = self.cascade.get(self._flips, 0) + 1
+        self._flips = 0
+        if self.timers is not None:
+            self.timers['location'] += located - start
+            self.timers['split'] += split - located
+            self.timers['legalize'] += end - split
@@ -1,23 +1,667 @@
 #!/usr/bin/env python
 
+import argparse
+import math
+import multiprocessing
+import os
 import random
+import sys
+import tempfile
+import time
+import traceback
 
+import numpy
+
+import bench
+import cells
+import graphs
+import parallel
+import predicates
+import query
+import relax
+import render
+import serialize
+import spatial
+import stats
 import voronoi
 
 def test_one(seed):
     r = random.Random(seed)
-    print 'seed =', seed
 
     points = [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
         for i in xrange(100)]
 
-    t = voronoi.triangulate(points)
+    for backend in ('object', 'array'):
+        for locate, order in (('dag', None), ('walk', None), ('walk', 'brio')):
+            t = voronoi.triangulate(points, backend=backend, locate=locate,
+                order=order)
+            voronoi.check_triangulation(t)
+            voronoi.check_dcel(t)
+            test_cells(points, t)
+
+    test_predicates(r, t)
+    test_history(r, points)
+    test_dynamic(r, points)
+    test_validate(points)
+    test_infinite(points)
+    test_stats(points)
+    test_serialize(points)
+    test_render(points)
+    test_query(r, points)
+    test_graphs(points)
+    test_relax(points)
+
+def test_cells(points, t):
+    """No site is closer to a corner of a cell than the cell's own site."""
+    c = cells.voronoi_cells(t, points)
+    assert len(c) == len(points)
+    for i in xrange(len(c)):
+        corners = c.cell(i)
+        own = ((corners - c.sites[i]) ** 2).sum(axis=1)
+        for site in c.sites:
+            assert all(((corners - site) ** 2).sum(axis=1) >= own - 1e-9)
+        assert area(corners) > 0
+
+    # Clipped cells tile the clip region.
+    c = cells.voronoi_cells(t, points, clip=(-.5, -.5, .5, .5))
+    total = sum(area(c.cell(i)) for i in xrange(len(c)))
+    assert abs(total - 1.) < 1e-9
+    assert (abs(c.points) <= .5 + 1e-12).all()
+
+    # So do the triangles of their fans.
+    vertices, elements = cells.fans(c)
+    assert len(elements) == len(c.indices)
+    total = sum(area(vertices[triangle, :2].astype(float))
+        for triangle in elements)
+    assert abs(total - 1.) < 1e-5
+    assert (vertices[elements, 2:] == vertices[elements[:, :1], 2:]).all()
+
+def area(polygon):
+    """The signed area of an (n, 2) array of polygon corners."""
+    x, y = polygon.T
+    return .5 * (x * numpy.roll(y, -1) - numpy.roll(x, -1) * y).sum()
+
+def test_history(r, points):
+    """Dropping the triangle tree leaves a mesh the walk can still search."""
+    for backend in ('object', 'array'):
+        for locate in ('dag', 'walk'):
+            t = voronoi.triangulate(points, backend=backend, locate=locate,
+                keep_history=False)
+            voronoi.check_triangulation(t)
+            voronoi.check_dcel(t)
+
+            for i in xrange(20):
+                v = voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
+                if backend == 'object':
+                    assert not t.children
+                    assert t.walk(v, r).inside(v)
+                else:
+                    assert all(t.is_leaf(f) for f in xrange(len(t.face_edge)))
+                    f = t.walk(next(t.leaves()), v.x, v.y, r)
+                    assert t.inside(f, v.x, v.y)
+
+def test_dynamic(r, points):
+    """Edit a Triangulation and check it is still Delauny."""
+    points = [voronoi.Vertex(v.x, v.y) for v in points]
+    t = voronoi.Triangulation(points[:80])
+    for v in points[80:]:
+        t.insert(v)
+    check_cache(t)
+    for v in points[:20]:
+        changed = t.remove(v)
+        assert sum(triangle.face is None for triangle in changed) == 2
+    for v in points[20:40]:
+        t.move(v, v.x * .9, v.y * .9)
+    for v in points[40:50]:
+        t.move(v, r.uniform(-1., 1.), r.uniform(-1., 1.))
+    check_cache(t)
+
+    # Small steps mostly flip, large ones make vertices leave their stars.
+    for step in (.01, .5):
+        positions = [((1 - step) * v.x + r.uniform(-step, step),
+            (1 - step) * v.y + r.uniform(-step, step)) for v in points[20:]]
+        t.update(points[20:], positions)
     voronoi.check_triangulation(t)
     voronoi.check_dcel(t)
 
+    check_cache(t)
+
+    n = len(points) - 20
+    assert len(list(t.iter_vertices())) == n
+    assert len(list(t.iter_vertices(include_artificial=True))) == n + 3
+    assert len(list(t.iter_edges())) == 3 * n + 3
+    assert len(list(t.iter_edges(unique=False))) == 6 * n + 6
+    assert len(list(t.iter_faces())) == 2 * n + 1
+    c = cells.voronoi_cells(t)
+    assert len(c) == n and len(c.points) == 2 * n + 1
+
+def check_cache(t):
+    """Every cached circle and area must still be current."""
+    for face in t.iter_faces():
+        triangle = face.data
+        cached = triangle.circle(), triangle.area()
+        triangle.invalidate()
+        assert cached == (triangle.circle(), triangle.area())
+
+def test_validate(points):
+    """validate finds an edge flipped the wrong way."""
+    points = [voronoi.Vertex(v.x, v.y) for v in points]
+    t = voronoi.triangulate(points, locate='walk')
+    report = voronoi.validate(t)
+    assert report.ok()
+    assert report.verticies == len(points) + 3
+    assert report.faces == 2 * len(points) + 1
+    assert report.edges == 3 * len(points) + 3
+    assert len(list(t.iter_vertices())) == len(points)
+    mesh = voronoi.triangulate(points, backend='array', locate='walk')
+    assert str(voronoi.validate(mesh)) == str(report)
+    assert len(list(mesh.iter_edges(unique=False))) == 6 * len(points) + 6
+    assert len(list(mesh.iter_vertices())) == len(points)
+
+    # Any edge between two input vertices that can be flipped without
+    # turning a triangle over.
+    for edge in t.iter_edges():
+        a, b = edge.origin, edge.twin.origin
+        if a.artificial or b.artificial:
+            continue
+        c, d = edge.next.next.origin, edge.twin.next.next.origin
+        if voronoi._orient(c, d, a) < 0 < voronoi._orient(c, d, b):
+            break
+    else:
+        return
+    voronoi._flip(edge)
+    report = voronoi.validate(t)
+    assert not report.ok()
+    assert not report.inverted
+    assert len(report.illegal) == 1
+
+def test_infinite(points):
+    """A vertex at infinity gives the Delauny triangulation of the points
+    alone, with one ghost face per hull edge.
+
+    """
+    for order in (None, 'brio'):
+        t = voronoi.triangulate(points, locate='walk', order=order,
+            boundary='infinite')
+        voronoi.check_triangulation(t)
+        voronoi.check_dcel(t)
+
+        # Hull cells reach far out, so compare distances relatively.
+        c = cells.voronoi_cells(t, points)
+        for i in xrange(len(c)):
+            corners = c.cell(i)
+            own = ((corners - c.sites[i]) ** 2).sum(axis=1)
+            for site in c.sites:
+                assert all(((corners - site) ** 2).sum(axis=1) >=
+                    own * (1. - 1e-12) - 1e-9)
+            assert area(corners) > 0
+        c = cells.voronoi_cells(t, points, clip=(-.5, -.5, .5, .5))
+        total = sum(area(c.cell(i)) for i in xrange(len(c)))
+        assert abs(total - 1.) < 1e-9
+
+        faces = [edge.face.data for edge in t.iter_edges(unique=False)
+            if edge.origin.x is None]
+        hull = len(faces)
+        report = voronoi.validate(t)
+        assert report.ok()
+        assert report.verticies == len(points)
+        assert report.edges == 3 * len(points) - 3 - hull
+        assert report.faces == 2 * len(points) - 2 - hull
+        assert all(face.is_ghost() for face in faces)
+
+    try:
+        voronoi.triangulate([voronoi.Vertex(i, 2 * i) for i in xrange(5)],
+            locate='walk', boundary='infinite')
+    except ValueError:
+        pass
+    else:
+        assert False, 'collinear points triangulated'
+
+def test_stats(points):
+    """Both backends count the same work, and counting changes nothing."""
+    for locate, order in (('dag', None), ('walk', 'brio')):
+        counted = []
+        for backend in ('object', 'array'):
+            s = stats.Stats(timers=True)
+            t = voronoi.triangulate(points, backend=backend, locate=locate,
+                order=order, stats=s)
+            voronoi.check_triangulation(t)
+            assert s.insertions == len(points)
+            assert sum(s.location.values()) == len(points)
+            assert sum(s.cascade.values()) == len(points)
+            assert s.flips == sum(k * v for k, v in s.cascade.items())
+            assert s.locate_steps == sum(k * v for k, v in s.location.items())
+            assert s.incircle >= s.flips
+            assert min(s.timers.values()) >= 0
+            counted.append((s.flips, s.incircle))
+        assert counted[0] == counted[1]
+
+def test_serialize(points):
+    """Saved meshes load back as the same triangulation."""
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        copies = [voronoi.Vertex(v.x, v.y) for v in points]
+        for t in (voronoi.triangulate(points, backend='array'),
+                voronoi.triangulate(points, locate='walk'),
+                voronoi.Triangulation(copies)):
+            serialize.save(t, path)
+            for mmap in (True, False):
+                mesh = serialize.load(path, mmap)
+                voronoi.check_triangulation(mesh)
+                voronoi.check_dcel(mesh)
+                assert len(list(mesh.leaves())) == 2 * len(points) + 1
+                start = next(mesh.leaves())
+                for v in points[:10]:
+                    assert mesh.inside(mesh.walk(start, v.x, v.y), v.x, v.y)
+                c = cells.voronoi_cells(mesh)
+                assert len(c) == len(points)
+                assert sorted(map(tuple, c.sites)) == sorted((v.x, v.y)
+                    for v in points)
+
+        # Given the input, object meshes keep it in order.
+        t = voronoi.triangulate(points, locate='walk')
+        serialize.save(t, path, points)
+        mesh = serialize.load(path)
+        assert mesh.order.tolist() == range(len(points))
+        assert mesh.x[:len(points)].tolist() == [v.x for v in points]
+        assert mesh.y[:len(points)].tolist() == [v.y for v in points]
+        voronoi.check_dcel(mesh)
+
+        # An editable copy comes back from a plain load.
+        mesh = serialize.load(path, mmap=False)
+        mesh.discard_history()
+        serialize.save(mesh, path)
+        assert serialize.load(path).order.tolist() == list(mesh.order)
+
+        with open(path, 'wb') as f:
+            f.write('not a mesh')
+        try:
+            serialize.load(path)
+        except ValueError:
+            pass
+        else:
+            assert False, 'loaded a bad file'
+    finally:
+        os.remove(path)
+
+def test_render(points):
+    """Tiles give the same image as measuring every pixel to every site."""
+    t = voronoi.triangulate(points, backend='array')
+    image = render.render(t, 45, 30, offset=.3, tile=8)
+
+    px = -1. + (numpy.arange(45) + .5) * (2. / 45)
+    py = 1. - (numpy.arange(30) + .5) * (2. / 30)
+    sites = numpy.array([(v.x, v.y) for v in points])
+    dx = px[None, :, None] - sites[:, 0]
+    dy = py[:, None, None] - sites[:, 1]
+    distance = numpy.sqrt((dx * dx + dy * dy).min(axis=2))
+    assert abs(image - render.rings(distance, .3)).max() < 1e-5
+
+def test_query(r, points):
+    """Batch queries agree with the mesh and with brute force."""
+    qx = [r.uniform(-1.2, 1.2) for i in xrange(300)]
+    qy = [r.uniform(-1.2, 1.2) for i in xrange(300)]
+    # Far outside the sites, where some of them are outside the enclosing
+    # triangle too.
+    for i in xrange(200):
+        angle = r.uniform(0., 2. * math.pi)
+        distance = r.choice((1.5, 3.5, 10., 1e3))
+        qx.append(distance * math.cos(angle))
+        qy.append(distance * math.sin(angle))
+    qx = numpy.array(qx)
+    qy = numpy.array(qy)
+    copies = [voronoi.Vertex(v.x, v.y) for v in points]
+    # A thin strip, whose hull is nearly flat.
+    strip = [voronoi.Vertex(v.x, v.y * 1e-4) for v in points]
+    for t in (voronoi.triangulate(points, backend='array'),
+            voronoi.Triangulation(copies),
+            voronoi.triangulate(strip, backend='array')):
+        locator = query.Locator(t)
+        faces = locator.locate(qx, qy)
+        nearest = locator.nearest(qx, qy)
+        x = numpy.asarray(locator.mesh.x)
+        y = numpy.asarray(locator.mesh.y)
+        artificial = numpy.asarray(locator.mesh.artificial) != 0
+        for i in xrange(len(qx)):
+            if faces[i] != -1:
+                assert locator.mesh.inside(faces[i], qx[i], qy[i])
+            else:
+                q = voronoi.Vertex(qx[i], qy[i])
+                a, b, c = [voronoi.Vertex(x[v], y[v])
+                    for v in numpy.flatnonzero(artificial)]
+                assert min(voronoi._orient(a, b, q), voronoi._orient(b, c, q),
+                    voronoi._orient(c, a, q)) < 0
+            distance = (x - qx[i]) ** 2 + (y - qy[i]) ** 2
+            distance[artificial] = numpy.inf
+            assert distance[nearest[i]] == distance.min()
+        if locator.verticies is not None:
+            assert not any(locator.verticies[v].artificial for v in nearest)
+
+    for i in xrange(100):
+        ix, iy = r.randrange(1 << 16), r.randrange(1 << 16)
+        assert spatial.hilbert_indices([ix], [iy])[0] == \
+            spatial.hilbert_index(ix, iy)
+
+def test_graphs(points):
+    """The neighbour graphs match brute force over every pair of sites."""
+    g = graphs.Graph(voronoi.triangulate(points, backend='array'))
+    xy = numpy.array([(v.x, v.y) for v in points])
+    distance = numpy.sqrt(((xy[:, None] - xy[None, :]) ** 2).sum(axis=2))
+    numpy.fill_diagonal(distance, numpy.inf)
+    assert (g.sites == numpy.arange(len(points))).all()
+
+    # Prim's algorithm over the complete graph.
+    tree = g.spanning_tree()
+    assert len(tree) == len(points) - 1
+    best = distance[0].copy()
+    best[0] = -1
+    weight = 0.
+    for i in xrange(len(points) - 1):
+        j = numpy.argmin(numpy.where(best < 0, numpy.inf, best))
+        weight += best[j]
+        best = numpy.minimum(best, distance[j])
+        best[j] = -1
+    assert abs(distance[tree[:, 0], tree[:, 1]].sum() - weight) < 1e-9
+
+    near = g.nearest(4)
+    assert (distance[numpy.arange(len(points))[:, None], near] ==
+        numpy.sort(distance, axis=1)[:, :4]).all()
+
+    offsets, indices = g.within(.3)
+    for i in xrange(len(points)):
+        assert (sorted(indices[offsets[i]:offsets[i + 1]]) ==
+            list(numpy.flatnonzero(distance[i] <= .3)))
+
+def test_predicates(r, mesh):
+    """Check the batch predicates against the scalar ones on an ArrayMesh."""
+    faces = list(mesh.leaves())
+    triples = [mesh.vertices(f) for f in faces]
+    areas = predicates.orient2d(mesh.x, mesh.y, triples)
+    assert all(areas > 0)
+
+    centers = predicates.circumcenters(mesh.x, mesh.y, triples)
+    radii = predicates.circumradii(mesh.x, mesh.y, triples)
+    for (a, b, c), (x, y), radius in zip(triples, centers, radii):
+        for v in (b, c):
+            assert abs(math.hypot(mesh.x[v] - x, mesh.y[v] - y) - radius) < 1e-9
+    assert numpy.allclose(2 * predicates.areas(mesh.x, mesh.y, triples),
+        [mesh.area(f) for f in faces])
+
+    quads = []
+    expected = []
+    for i in xrange(100):
+        f = r.choice(faces)
+        d = r.randrange(len(mesh.x))
+        quads.append(mesh.vertices(f) + (d,))
+        expected.append(mesh.incircle(f, d))
+    assert list(predicates.incircle(mesh.x, mesh.y, quads) > 0) == expected
+
+def test_degenerate():
+    """Grids and circles are full of cocircular and collinear points."""
+    grid = [voronoi.Vertex(i / 7. - 1., j / 7. - 1.)
+        for i in xrange(15) for j in xrange(15)]
+    circle = [voronoi.Vertex(math.cos(i * math.pi / 25),
+        math.sin(i * math.pi / 25)) for i in xrange(50)]
+
+    for points in (grid, circle):
+        for backend in ('object', 'array'):
+            for locate in ('dag', 'walk'):
+                t = voronoi.triangulate(points, backend=backend,
+                    locate=locate, order='brio')
+                voronoi.check_triangulation(t)
+                voronoi.check_dcel(t)
+        t = voronoi.triangulate(points, locate='walk', order='brio',
+            boundary='infinite')
+        voronoi.check_triangulation(t)
+        voronoi.check_dcel(t)
+        assert voronoi.validate(t).ok()
+
+def test_tiny():
+    """Inputs with no extent still get a proper enclosing triangle."""
+    for points in ([], [voronoi.Vertex(0., 0.)],
+            [voronoi.Vertex(0., 0.), voronoi.Vertex(1e-9, 0.)]):
+        for backend in ('object', 'array'):
+            for locate in ('dag', 'walk'):
+                t = voronoi.triangulate(points, backend=backend,
+                    locate=locate)
+                voronoi.check_triangulation(t)
+                voronoi.check_dcel(t)
+
+def test_coverage():
+    """The cells of a mesh with a vertex at infinity tile the clip region,
+    even for thin and nearly collinear inputs.
+
+    """
+    r = random.Random(0)
+    inputs = [[voronoi.Vertex(x, y) for x, y in ((-1., 0.), (1., 0.),
+        (0., height), (0., -height), (.5, 0.))]
+        for height in (1e-4, 1e-5, 1e-8)]
+    inputs.append([voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1e-4, 1e-4))
+        for i in xrange(50)])
+    for points in inputs:
+        t = voronoi.triangulate(points, locate='walk', boundary='infinite')
+        for side in (2., 1e5):
+            c = cells.voronoi_cells(t, points, clip=(-side, -side, side,
+                side))
+            total = sum(area(c.cell(i)) for i in xrange(len(c)))
+            assert abs(total / (4. * side * side) - 1.) < 1e-9
+
+def test_parallel():
+    """The strips and the seam have to fit back together."""
+    r = random.Random(0)
+    points = [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
+        for i in xrange(300)]
+    grid = [voronoi.Vertex(i / 7. - 1., j / 7. - 1.)
+        for i in xrange(15) for j in xrange(15)]
+
+    for points in (points, grid):
+        for backend in ('object', 'array'):
+            t = parallel.triangulate_parallel(points, workers=3,
+                backend=backend)
+            voronoi.check_triangulation(t)
+            voronoi.check_dcel(t)
+
+def test_relax(points):
+    """Relaxing moves the sites inside the bounds and keeps the mesh
+    Delauny.
+
+    """
+    points = [voronoi.Vertex(v.x, v.y) for v in points]
+    result = relax.relax(points, 5)
+    mesh = result.mesh
+    assert len(result.shifts) == len(result.flips) == 5
+    assert voronoi.validate(mesh).ok()
+    voronoi.check_dcel(mesh)
+    for i, v in enumerate(points):
+        assert (mesh.x[i], mesh.y[i]) == (v.x, v.y)
+        assert abs(v.x) <= 1. and abs(v.y) <= 1.
+
+    # The clipped cells cover the square, whose centroid is the origin.
+    c = cells.voronoi_cells(mesh, clip=(-1., -1., 1., 1.))
+    areas, centers = cells.centroids(c)
+    assert abs(areas.sum() - 4.) < 1e-9
+    assert (abs((areas[:, None] * centers).sum(axis=0)) < 1e-9).all()
+
+    result = relax.relax(points, 100, tolerance=.01, mesh=mesh)
+    assert result.converged
+    assert result.shifts[-1] <= .01
+
+# The inputs main checks besides the 100 point suite of test_one, as
+# distribution:size pairs.  See bench.DISTRIBUTIONS.
+MIX = 'uniform:1000,clustered:1000,sorted:1000,grid:400,circle:300,uniform:10000'
+
+def make_points(seed, distribution, n):
+    """The input of one case of main, without repeated points.
+
+    A distribution of None gives the points test_one draws.
+
+    """
+    r = random.Random(seed)
+    if distribution is None:
+        return [voronoi.Vertex(r.uniform(-1., 1.), r.uniform(-1., 1.))
+            for i in xrange(100)]
+    points = []
+    seen = set()
+    for v in bench.DISTRIBUTIONS[distribution](r, n):
+        if (v.x, v.y) not in seen:
+            seen.add((v.x, v.y))
+            points.append(v)
+    return points
+
+def collinear(points):
+    """Are all the points on one line?"""
+    for v in points:
+        if (v.x, v.y) != (points[0].x, points[0].y):
+            return all(voronoi._orient(points[0], v, w) == 0 for w in points)
+    return True
+
+def check_points(points):
+    """Triangulate points with every backend and option and check the
+    meshes.
+
+    """
+    for backend in ('object', 'array'):
+        for locate, order in (('dag', None), ('walk', None), ('walk', 'brio')):
+            t = voronoi.triangulate(points, backend=backend, locate=locate,
+                order=order)
+            voronoi.check_triangulation(t)
+            voronoi.check_dcel(t)
+    if not collinear(points):
+        t = voronoi.triangulate(points, locate='walk', order='brio',
+            boundary='infinite')
+        voronoi.check_triangulation(t)
+        voronoi.check_dcel(t)
+
+def fails(points):
+    """Does check_points fail on a copy of points?"""
+    try:
+        check_points([voronoi.Vertex(v.x, v.y) for v in points])
+    except Exception:
+        return True
+    return False
+
+def shrink(points):
+    """Return a small subset of points for which check_points still fails.
+
+    Drops halves of the points while they keep failing, then quarters and
+    so on down to single points.
+
+    """
+    chunk = len(points)
+    while chunk > 1:
+        chunk = (chunk + 1) // 2
+        i = 0
+        while i < len(points):
+            candidate = points[:i] + points[i + chunk:]
+            if fails(candidate):
+                points = candidate
+            else:
+                i += chunk
+    return points
+
+def run_case(job):
+    """Run one case of main in a worker process.
+
+    job is (seed, distribution, size, shrink).  A distribution of None runs
+    test_one.  Returns (seed, distribution, size, points, seconds, failure),
+    where failure is None or (traceback, points).  The points are the
+    smallest failing input shrink found, or None if check_points alone does
+    not fail on the input or shrinking is off.
+
+    """
+    seed, distribution, n, shrinking = job
+    points = make_points(seed, distribution, n)
+    failure = None
+    start = time.time()
+    try:
+        if distribution is None:
+            test_one(seed)
+        else:
+            check_points(points)
+    except Exception:
+        failure = traceback.format_exc()
+    seconds = time.time() - start
+
+    if failure is not None:
+        small = None
+        if shrinking and fails(points):
+            small = [(v.x, v.y) for v in shrink(points)]
+        failure = failure, small
+    return seed, distribution, n, len(points), seconds, failure
+
 def main():
-    for i in xrange(6000, 8000):
-        test_one(i)
+    parser = argparse.ArgumentParser(description='Triangulate random inputs '
+        'in a pool of processes and check the results.')
+    parser.add_argument('-j', '--workers', type=int,
+        default=multiprocessing.cpu_count(),
+        help='processes to use (default: one per CPU)')
+    parser.add_argument('--seeds', default='6000:8000',
+        help='seeds FIRST:LAST for the 100 point suite (default: %(default)s)')
+    parser.add_argument('--mix', default=MIX,
+        help='comma separated distribution:size inputs to check as well '
+        '(default: %(default)s)')
+    parser.add_argument('--mix-seeds', type=int, default=10,
+        help='seeds per mix input, counting from FIRST (default: '
+        '%(default)s)')
+    parser.add_argument('--no-shrink', dest='shrink', action='store_false',
+        help='report failing inputs without shrinking them')
+    args = parser.parse_args()
+
+    first, last = [int(seed) for seed in args.seeds.split(':')]
+    mix = []
+    for item in args.mix.split(','):
+        if item:
+            distribution, n = item.split(':')
+            if distribution not in bench.DISTRIBUTIONS:
+                parser.error('unknown distribution {0!r}'.format(distribution))
+            mix.append((distribution, int(n)))
+
+    test_degenerate()
+    test_tiny()
+    test_coverage()
+    test_parallel()
+
+    jobs = [(seed, distribution, n, args.shrink) for distribution, n in mix
+        for seed in xrange(first, first + args.mix_seeds)]
+    jobs.extend((seed, None, 100, args.shrink) for seed in xrange(first, last))
+    # Largest first, so the pool is not left waiting on one big case.
+    jobs.sort(key=lambda job: -job[2])
+
+    totals = {}
+    failed = 0
+    start = time.time()
+    pool = multiprocessing.Pool(args.workers)
+    try:
+        for seed, distribution, n, points, seconds, failure in \
+                pool.imap_unordered(run_case, jobs):
+            name = 'suite' if distribution is None else '{0}:{1}'.format(
+                distribution, n)
+            cases, total, busy = totals.get(name, (0, 0, 0.))
+            totals[name] = cases + 1, total + points, busy + seconds
+            if failure is not None:
+                failed += 1
+                trace, small = failure
+                print '{0} seed {1} failed'.format(name, seed)
+                print trace
+                if small is not None:
+                    print 'shrunk to {0} points:'.format(len(small))
+                    print small
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+
+    for name in sorted(totals):
+        cases, total, busy = totals[name]
+        print '{0:>16} {1:6} cases {2:9} points {3:10.0f} points/s'.format(
+            name, cases, total, total / busy if busy else 0.)
+    total = sum(points for cases, points, busy in totals.values())
+    print '{0} cases, {1} failed, in {2:.1f}s with {3} workers: ' \
+        '{4:.1f} cases/s, {5:.0f} points/s'.format(len(jobs), failed, elapsed,
+        args.workers, len(jobs) / elapsed, total / elapsed)
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -1,26 +1,47 @@
 #!/usr/bin/env python
 
+import itertools
 import math
+import random
+
+import arraymesh
+import robust
+import spatial
 
 class OutsideTriangleError(Exception):
     pass
 
+# Stamps for Face.mark and Vertex.mark, a fresh one for each search of a
+# mesh.
+_stamps = itertools.count(1)
+
 class Vertex(object):
     """Class representing a vertex.
 
     'x', 'y' is the verticies position.
     'edge' points to an edge leaving this vertex.
     'artificial' is true if this vertex was not part of the input set
+    'index' is this vertex's place in the registry of the Triangulation
+    holding it, if any.
+    'mark' is the stamp of the last search that reached this vertex, see
+    Triangle.iter_vertices.
+
+    The vertex at infinity of a mesh built with boundary='infinite' is
+    artificial and has None for 'x' and 'y'.
 
     """
-    __slots__ = ['x', 'y', 'edge', 'artificial']
+    __slots__ = ['x', 'y', 'edge', 'artificial', 'index', 'mark']
     def __init__(self, x, y, artificial=False):
         self.x = x
         self.y = y
         self.edge = None
         self.artificial = artificial
+        self.index = None
+        self.mark = 0
 
     def __repr__(self):
+        if self.x is None:
+            return 'Vertex(infinity)'
         return 'Vertex({0:f}, {1:f})'.format(self.x, self.y)
 
 class HalfEdge(object):
@@ -32,27 +53,27 @@ class HalfEdge(object):
     'origin' is the vertex this edge originates from.
     'next' is the edge leaving 'twin.origin' that is part of the same face.
     'face' is the face to the left of this edge.
+    'index' is the place of this edge and its twin in the registry of the
+    Triangulation holding them, if any.
 
     """
-    __slots__ = ['origin', 'twin', 'next', 'face']
+    __slots__ = ['origin', 'twin', 'next', 'face', 'index']
 
     def __init__(self):
         """PRIVATE.  Use make_edge_pair instead."""
 
         self.next = None
         self.face = None
+        self.index = None
 
     def sign(self, v):
         """Negative if vertex is to the left of this edge.
-        
-        There are faster ways of computing this, but we use the edge equations
-        for traversing the triangle tree.  We use edge equations here for
-        consistency.
+
+        The sign is exact, see robust.orient2d.  This is the same test used
+        for traversing the triangle tree.
 
         """
-        A, B, C = self.coefs()
-        C = -(A * self.origin.x + B * self.origin.y)
-        return A * v.x + B * v.y + C
+        return -_orient(self.origin, self.twin.origin, v)
 
     def coefs(self):
         """Equation of the line containing this edge.
@@ -90,12 +111,15 @@ class Face(object):
     
     'data' is a user data point.
     'edge' is a pointer to any edge facing this face.
+    'mark' is the stamp of the last search that reached this face, see
+    Triangle.iter_faces.
 
     """
-    __slots__ = ['edge', 'data']
+    __slots__ = ['edge', 'data', 'mark']
     def __init__(self, edge, data=None):
         self.edge = edge
         self.data = data
+        self.mark = 0
 
     def edge_set(self):
         """The set of edges in the DCEL containing this face."""
@@ -124,33 +148,135 @@ class Triangle(object):
     this triangle, however the union of the children may be larger than this
     triangle.
 
+    A non-leaf node remembers the vertices it had as 'corners', so it can
+    still be used for point location.
+
+    A mesh built without history has only leaf nodes.  Splitting or flipping
+    reuses them in place.
+
+    'index' is this triangle's place in the registry of the Triangulation
+    holding it, if any.
+
+    circle and area are computed on first use and kept until the triangle
+    changes shape.  Anything that moves a vertex or rewires the face must
+    call invalidate.
+
     """
-    __slots__ = ['face', 'children', 'coefs']
+    __slots__ = ['face', 'children', 'corners', 'index', '_circle', '_area']
 
     def __init__(self, face):
         self.face = face
         self.face.data = self
         self.children = []
-
-        self.coefs = []
-        e = self.face.edge
-        for i in xrange(3):
-            self.coefs.append(e.coefs())
-            e = e.next
+        self.corners = None
+        self.index = None
+        self._circle = None
+        self._area = None
 
     def __repr__(self):
         return 'Triangle({0}, {1}, {2})'.format(self.face.edge.origin,
             self.face.edge.next.origin, self.face.edge.next.next.origin)
 
+    def invalidate(self):
+        """Forget the cached circle and area."""
+        self._circle = None
+        self._area = None
+
     def get_face(self):
         """A face that's part of this triangulation."""
         while self.children:
             self = self.children[0]
         return self.face
 
+    def iter_faces(self):
+        """Generate the faces of the mesh this triangle is part of.
+
+        The mesh is searched from get_face().  Faces are stamped as they are
+        reached instead of being collected in a set, and the search is done
+        before the first face is generated, so searches may nest.
+
+        """
+        stamp = next(_stamps)
+        face = self.get_face()
+        face.mark = stamp
+        faces = [face]
+        i = 0
+        while i < len(faces):
+            first = edge = faces[i].edge
+            while True:
+                face = edge.twin.face
+                if face is not None and face.mark != stamp:
+                    face.mark = stamp
+                    faces.append(face)
+                edge = edge.next
+                if edge is first:
+                    break
+            i += 1
+        return iter(faces)
+
+    def iter_edges(self, unique=True):
+        """Generate the half-edges of the mesh this triangle is part of.
+
+        If unique is true only one half-edge of each pair is generated.  See
+        iter_faces.
+
+        """
+        for face in self.iter_faces():
+            edge = face.edge
+            for i in xrange(3):
+                pair = edge.twin
+                if pair.face is None:
+                    # Outer edges are reached from one side only.
+                    yield edge
+                    if not unique:
+                        yield pair
+                elif not unique or id(edge) < id(pair):
+                    yield edge
+                edge = edge.next
+
+    def iter_vertices(self, include_artificial=False):
+        """Generate the vertices of the mesh this triangle is part of.
+
+        The vertices are stamped rather than told apart by their 'edge',
+        which points into the last mesh built from them.  See iter_faces.
+
+        """
+        stamp = next(_stamps)
+        verticies = []
+        for edge in self.iter_edges(unique=False):
+            vertex = edge.origin
+            if vertex.mark != stamp:
+                vertex.mark = stamp
+                if include_artificial or not vertex.artificial:
+                    verticies.append(vertex)
+        return iter(verticies)
+
+    def is_ghost(self):
+        """Is this a hull face, with the vertex at infinity as a corner?
+
+        Only meshes built with boundary='infinite' have them.
+
+        """
+        a, b, c = self.vertices()
+        return a.x is None or b.x is None or c.x is None
+
+    def vertices(self):
+        """The vertices of this triangle in counter-clockwise order."""
+        if self.face is None:
+            return self.corners
+        e = self.face.edge
+        return e.origin, e.next.origin, e.next.next.origin
+
     def inside(self, v):
-        """Is the vertex v contained in this triangle?"""
-        return all(A * v.x + B * v.y + C <= 0 for (A, B, C) in self.coefs)
+        """Is the vertex v contained in this triangle?
+
+        Vertices on an edge are inside.  The test is exact, so every vertex
+        inside a node is inside one of its children.
+
+        """
+        a, b, c = self.vertices()
+        return (_orient(a, b, v) >= 0 and _orient(b, c, v) >= 0 and
+            _orient(c, a, v) >= 0)
 
     def incircle(self, d, limit=0):
         """Is the Vertex d in the circle defined by this triangle?
@@ -167,28 +293,14 @@ class Triangle(object):
         a = self.face.edge.origin
         b = self.face.edge.next.origin
         c = self.face.edge.next.next.origin
-
-        norm_a = a.x * a.x + a.y * a.y
-        norm_b = b.x * b.x + b.y * b.y
-        norm_c = c.x * c.x + c.y * c.y
-        norm_d = d.x * d.x + d.y * d.y
-
-        A = a.x - d.x
-        B = a.y - d.y
-        C = norm_a - norm_d
-        D = b.x - d.x
-        E = b.y - d.y
-        F = norm_b - norm_d
-        G = c.x - d.x
-        H = c.y - d.y
-        I = norm_c - norm_d
-
-        det = A * (E * I - F * H) - D * (B * I - C * H) + G * (B * F - C * E)
-        return det > limit
+        return _incircle(a, b, c, d) > limit
 
     def circumcenter(self):
         """The circumcenter of this triangle as a tuple (x, y)."""
-    
+        circle = self.circle()
+        return circle[0], circle[1]
+
+    def _circumcenter(self):
         A1, B1, C1 = self.face.edge.perpendicular()
         A2, B2, C2 = self.face.edge.next.perpendicular()
         # N.B.: If the triangle is not degenerate this cannot cause division
@@ -208,10 +320,12 @@ class Triangle(object):
         vertices that define this triangle.
 
         """
-        x, y = self.circumcenter()
-        v = self.face.edge.origin
-        r = (v.x - x) * (v.x - x) + (v.y - y) * (v.y - y)
-        return x, y, math.sqrt(r)
+        if self._circle is None:
+            x, y = self._circumcenter()
+            v = self.face.edge.origin
+            r = (v.x - x) * (v.x - x) + (v.y - y) * (v.y - y)
+            self._circle = x, y, math.sqrt(r)
+        return self._circle
 
 
     def child(self, v):
@@ -220,33 +334,106 @@ class Triangle(object):
         Vertex v must be contained in this triangle.
 
         """
-        # TODO: Optimize, we don't need to check against all 6 or 9 edge
-        # equations since we know v is in self.  In the 2 child case, one edge
-        # is sufficient.  In the 3 child case we need to check 2 edges.
+        # TODO: Optimize, we don't need up to 9 orientation tests since we
+        # know v is in self.  In the 2 child case, one test against the new
+        # diagonal is sufficient.  In the 3 child case we need 2.
         for child in self.children:
             if child.inside(v):
                 return child
         raise OutsideTriangleError()
 
-    def find_leaf(self, v):
-        """Returns the leaf triangle containing vertex v."""
+    def find_leaf(self, v, stats=None):
+        """Returns the leaf triangle containing vertex v.
+
+        If stats is given the descent is recorded in it, see stats.Stats.
+
+        """
         triangle = self
+        if stats is None:
+            while triangle.children:
+                triangle = triangle.child(v)
+            return triangle
+
+        depth = 0
+        misses = 0
         while triangle.children:
-            triangle = triangle.child(v)
+            for child in triangle.children:
+                if child.inside(v):
+                    break
+                misses += 1
+            else:
+                raise OutsideTriangleError()
+            triangle = child
+            depth += 1
+        stats.located(depth, misses)
         return triangle
 
+    def walk(self, v, rng=random, stats=None):
+        """Returns the leaf triangle containing vertex v.
+
+        Walks the live mesh starting from this leaf triangle instead of
+        descending the triangle tree.  Each step tries the edges starting
+        from a random one and never crosses back over the edge it came in
+        through, which keeps the walk from cycling.  If stats is given the
+        number of steps is recorded in it.
+
+        In a mesh with a vertex at infinity the walk may start on a hull face.
+        It ends on the first hull face it enters, which always contains v.
+
+        """
+        triangle = self
+        entry = None
+        steps = 0
+        if triangle.is_ghost():
+            entry = _hull_edge(triangle)
+            if _incircle_infinite(entry.origin, entry.next.origin,
+                    entry.next.next.origin, v) > 0:
+                if stats is not None:
+                    stats.located(steps)
+                return triangle
+            entry = entry.twin
+            triangle = entry.face.data
+            steps += 1
+        while True:
+            first = triangle.face.edge
+            edges = (first, first.next, first.next.next)
+            for i in _ROTATIONS[int(rng.random() * 3)]:
+                edge = edges[i]
+                if edge is entry:
+                    continue
+                if _orient(edge.origin, edge.next.origin, v) < 0:
+                    break
+            else:
+                if stats is not None:
+                    stats.located(steps)
+                return triangle
+
+            entry = edge.twin
+            if entry.face is None:
+                raise OutsideTriangleError()
+            triangle = entry.face.data
+            steps += 1
+            if entry.next.next.origin.x is None:
+                # v is beyond the hull edge just crossed.
+                if stats is not None:
+                    stats.located(steps)
+                return triangle
+
     def deep_split(self, v):
         """Split the leaf node containing vertex v by v."""
         leaf = self.find_leaf(v)
         leaf.split(v)
         return leaf
 
-    def split(self, v):
+    def split(self, v, history=True):
         """Split this triangle into 3 triangles.
 
-        Vertex v must be inside this triangle.
+        Vertex v must be inside this triangle.  Returns the three new
+        triangles, which become the children of this triangle.  If history is
+        false this triangle is reused as the first of them instead.
 
         """
+        self.invalidate()
         side0 = self.face.edge
         side1 = side0.next
         side2 = side1.next
@@ -267,7 +454,6 @@ class Triangle(object):
         side1.next = e2.twin
         side2.next = e0.twin
 
-        side0.face = Face(side0)
         side1.face = Face(side1)
         side2.face = Face(side2)
         e0.face = side0.face
@@ -277,8 +463,13 @@ class Triangle(object):
         e2.face = side2.face
         e0.twin.face = side2.face
 
+        if not history:
+            return [self, Triangle(side1.face), Triangle(side2.face)]
+
+        self.corners = (side0.origin, side1.origin, side2.origin)
         self.face = None
         self.children = [Triangle(side0.face), Triangle(side1.face), Triangle(side2.face)]
+        return self.children
 
     def far_edge(self, v):
         """Return the edge opposite vertex v.
@@ -296,49 +487,26 @@ class Triangle(object):
         edge = edge.next
         return edge
 
-    def flip(self, v):
+    def flip(self, v, history=True):
         """Flip the diagonal formed by this and the triangle opposite v.
 
          Vertex v must be part of this triangle.  The two new triangles are
-         inserted as children of both original triangles.
+         inserted as children of both original triangles and returned.  If
+         history is false the two original triangles are reused instead.
 
         """
         # The edge opposite v.
         edge = self.far_edge(v)
         # The triangle opposite v.
         neighbor = edge.twin.face.data
-        # The vertex opposite edge in neighbor.
-        target = edge.twin.next.next.origin
-
-        # Name edges that make up the quadrilateral
-        v_cw = edge.next
-        v_ccw = v_cw.next
-        t_cw = edge.twin.next
-        t_ccw = t_cw.next
-
-        # flip edge
-        edge.origin = v
-        edge.twin.origin = target
-
-        # edges for the new triangles
-        v_cw.next = edge
-        v_ccw.next = t_cw
-        t_cw.next = edge.twin
-        t_ccw.next = v_cw
-        edge.next = t_ccw
-        edge.twin.next = v_ccw
-
-        # faces for the edges
-        t_ccw.face = self.face
-        v_ccw.face = neighbor.face
-
-        # edges for the faces
-        self.face.edge = edge
-        neighbor.face.edge = edge.twin
-
-        # edges for the verticies loosing an edge
-        v_cw.origin.edge = v_cw
-        t_cw.origin.edge = t_cw
+        if history:
+            self.corners = self.vertices()
+            neighbor.corners = neighbor.vertices()
+
+        _flip(edge)
+
+        if not history:
+            return [self, neighbor]
 
         # update triangle tree
         children = [Triangle(self.face), Triangle(neighbor.face)]
@@ -346,20 +514,132 @@ class Triangle(object):
         neighbor.children = children
         self.face = None
         neighbor.face = None
+        return children
 
     def area(self):
         """Return twice the signed area of this triangle."""
-        a = self.face.edge.origin
-        b = self.face.edge.next.origin
-        c = self.face.edge.next.next.origin
+        if self._area is None:
+            a = self.face.edge.origin
+            b = self.face.edge.next.origin
+            c = self.face.edge.next.next.origin
+
+            v0x = b.x - a.x
+            v0y = b.y - a.y
+            v1x = c.x - b.x
+            v1y = c.y - b.y
+
+            self._area = v0x * v1y - v0y * v1x
+        return self._area
 
-        v0x = b.x - a.x
-        v0y = b.y - a.y
-        v1x = c.x - b.x
-        v1y = c.y - b.y
 
-        return v0x * v1y - v0y * v1x
+_ROTATIONS = ((0, 1, 2), (1, 2, 0), (2, 0, 1))
+
+def _orient(a, b, c):
+    """Positive if Vertices a, b, c are counter-clockwise.  See robust."""
+    return robust.orient2d(a.x, a.y, b.x, b.y, c.x, c.y)
+
+def _incircle(a, b, c, d):
+    """The incircle determinant of Vertex d and triangle abc.
+
+    Positive if d is inside the circle through a, b and c, which must be in
+    counter-clockwise order.  The sign is exact, see robust.incircle.
+
+    """
+    return robust.incircle(a.x, a.y, b.x, b.y, c.x, c.y, d.x, d.y)
 
+def _incircle_infinite(a, b, c, d):
+    """_incircle, allowing for the vertex at infinity.
+
+    The circle of a hull face is the open half-plane beyond its hull edge
+    together with the open edge itself, the limit of circles through the
+    edge as the third vertex goes to infinity.  The vertex at infinity is in
+    no circle.
+
+    """
+    if a.x is not None and b.x is not None and c.x is not None:
+        if d.x is None:
+            return -1
+        return robust.incircle(a.x, a.y, b.x, b.y, c.x, c.y, d.x, d.y)
+    if d.x is None:
+        return -1
+    if a.x is None:
+        a, b, c = b, c, a
+    elif b.x is None:
+        a, b, c = c, a, b
+
+    # The hull face lies to the left of a -> b.
+    side = _orient(a, b, d)
+    if side:
+        return side
+    dx = b.x - a.x
+    dy = b.y - a.y
+    along = (d.x - a.x) * dx + (d.y - a.y) * dy
+    return 1 if 0 < along < dx * dx + dy * dy else -1
+
+def _hull_edge(triangle):
+    """The edge of a hull face between its two finite vertices."""
+    edge = triangle.face.edge
+    while edge.origin.x is None or edge.next.origin.x is None:
+        edge = edge.next
+    return edge
+
+def _flip(edge):
+    """Flip 'edge' to join the vertices opposite it in its two faces.
+
+    Afterwards 'edge' leaves the vertex that was opposite it in 'edge.face'.
+    Both faces are kept: 'edge.face' and 'edge.twin.face' are the two new
+    triangles.
+
+    """
+    pair = edge.twin
+    # The vertex opposite edge, and the vertex opposite pair.
+    v = edge.next.next.origin
+    target = pair.next.next.origin
+
+    # Name edges that make up the quadrilateral
+    v_cw = edge.next
+    v_ccw = v_cw.next
+    t_cw = pair.next
+    t_ccw = t_cw.next
+
+    # flip edge
+    edge.origin = v
+    pair.origin = target
+
+    # edges for the new triangles
+    v_cw.next = edge
+    v_ccw.next = t_cw
+    t_cw.next = pair
+    t_ccw.next = v_cw
+    edge.next = t_ccw
+    pair.next = v_ccw
+
+    # faces for the edges
+    t_ccw.face = edge.face
+    v_ccw.face = pair.face
+
+    # edges for the faces
+    edge.face.edge = edge
+    pair.face.edge = pair
+
+    # edges for the verticies loosing an edge
+    v_cw.origin.edge = v_cw
+    t_cw.origin.edge = t_cw
+
+    edge.face.data.invalidate()
+    pair.face.data.invalidate()
+
+def _enclosing(max_coord):
+    """The corners of the enclosing triangle, counter-clockwise.
+
+    Every point with both coordinates in [-max_coord, max_coord] is strictly
+    inside it, so no input vertex can land on one of its edges.  max_coord
+    is at least 1, so input that is empty or all at the origin still gets a
+    proper triangle.
+
+    """
+    M = 4 * max(max_coord, 1.)
+    return (M, 0), (0, M), (-M, -M)
 
 def _make_edge_pair(v0, v1):
     """Make an edge from v0 to v1."""
@@ -396,83 +676,678 @@ def _make_triangle(v0, v1, v2):
     return Triangle(f)
 
 
-def _legalize(triangle, v):
-    """Flip edges until 'triangle' is legal relative to vertex v."""
-    face = triangle.far_edge(v).twin.face
-    if face is not None:
-        adjacent = face.data
-        if adjacent.incircle(v):
-            triangle.flip(v)
-            assert len(triangle.children) == 2
-            _legalize(triangle.children[0], v)
-            _legalize(triangle.children[1], v)
+def _legalize(triangles, v, history=True, stats=None, infinite=False):
+    """Flip edges until 'triangles' are legal relative to vertex v.
 
+    'triangles' are the triangles made by splitting a triangle with v.  Their
+    'face.edge' must be the edge opposite v.  The edges still to be checked
+    are kept on a stack, in the order the recursive formulation would visit
+    them.  If history is false the flipped triangles are reused in place and
+    no tree nodes are made.  If stats is given the incircle tests and flips
+    are recorded in it.  infinite must be true if the mesh has a vertex at
+    infinity.
 
-def triangulate(verticies, max_coord=None):
+    """
+    incircle = _incircle_infinite if infinite else _incircle
+    tests = 0
+    flips = 0
+    stack = [triangle.face.edge for triangle in reversed(triangles)]
+    while stack:
+        edge = stack.pop()
+        pair = edge.twin
+        if pair.face is None:
+            continue
+        tests += 1
+        if incircle(pair.origin, pair.next.origin, pair.next.next.origin,
+                v) <= 0:
+            continue
+        flips += 1
+
+        if history:
+            triangle = edge.face.data
+            neighbor = pair.face.data
+            triangle.corners = triangle.vertices()
+            neighbor.corners = neighbor.vertices()
+            _flip(edge)
+            children = [Triangle(edge.face), Triangle(pair.face)]
+            triangle.children = children
+            neighbor.children = children
+            triangle.face = None
+            neighbor.face = None
+        else:
+            _flip(edge)
+
+        # 'edge' now leaves v.  Check the far sides of both new triangles.
+        stack.append(pair.next.next)
+        stack.append(edge.next)
+
+    if stats is not None:
+        stats.legalized(tests, flips)
+
+
+def triangulate(verticies, max_coord=None, backend='object', locate='dag',
+        keep_history=True, order=None, stats=None, boundary='triangle'):
     """Compute the Delauny triangulation of 'vertices.'
 
-    Returns the root of a triangle tree.
+    Returns the root of a triangle tree.  When there is no tree (see locate
+    and keep_history) a leaf triangle of the mesh is returned instead.
     max_coord is the largest absolute value of any coordinate in verticies.
     If None, it will be computed.
+    backend selects the mesh storage.  'object' builds Vertex, HalfEdge, Face
+    and Triangle objects.  'array' returns an arraymesh.ArrayMesh instead,
+    which keeps the mesh and the triangle tree in flat arrays.
+    locate selects how each vertex finds the triangle containing it.  'dag'
+    descends the triangle tree.  'walk' walks the live mesh from the last
+    triangle split and never builds the tree, so memory stays proportional to
+    the size of the output.
+    If keep_history is false the triangle tree is thrown away once every
+    vertex has been added.
+    order is the order vertices are inserted in.  None uses the order of
+    verticies.  'brio' uses spatial.brio_order, which gives point location
+    and flipping much better locality on sorted or clustered input.  Any
+    other value is a permutation: the i'th vertex inserted is
+    verticies[order[i]].  Call spatial.brio_order directly to get the
+    permutation it uses.  The result refers to the original vertices either
+    way; an ArrayMesh keeps input indices and records the permutation in
+    'order'.
+    stats is an optional stats.Stats to record counters in.
+    boundary selects what closes the mesh around the input.  'triangle'
+    encloses it in a large triangle with three artificial vertices.
+    'infinite' instead joins every hull edge to a single vertex at infinity,
+    making one hull face per hull edge, and needs no max_coord.  Incircle
+    tests against hull faces are special cased, see is_ghost and
+    _incircle_infinite.  It is only supported with the 'object' backend and
+    locate='walk', and needs three vertices that are not collinear.
 
     """
-    if max_coord is None:
+    if backend not in ('object', 'array'):
+        raise ValueError('unknown backend {0!r}'.format(backend))
+    if locate not in ('dag', 'walk'):
+        raise ValueError('unknown locate {0!r}'.format(locate))
+    if boundary not in ('triangle', 'infinite'):
+        raise ValueError('unknown boundary {0!r}'.format(boundary))
+    infinite = boundary == 'infinite'
+    if infinite and (backend != 'object' or locate != 'walk'):
+        raise ValueError("boundary 'infinite' needs the 'object' backend "
+            "and locate 'walk'")
+
+    if max_coord is None and not infinite:
         max_coord = 0
         for vertex in verticies:
             max_coord = max(max_coord, abs(vertex.x), abs(vertex.y))
 
-    # Build a triangle that contains all points in vertices
-    M = 3 * max_coord
-    triangle = _make_triangle(Vertex(M, 0, True), Vertex(0, M, True),
-        Vertex(-M, -M, True))
+    if order == 'brio':
+        order = spatial.brio_order(verticies)
+
+    if backend == 'array':
+        return arraymesh.triangulate(verticies, max_coord, locate,
+            keep_history, order, stats)
+
+    if order is not None:
+        verticies = [verticies[i] for i in order]
+    # Vertices may still point into a mesh built from them earlier.
+    for vertex in verticies:
+        vertex.edge = None
+
+    if infinite:
+        triangle, verticies = _infinite_start(verticies)
+    else:
+        # Build a triangle that contains all points in vertices
+        triangle = _make_triangle(*[Vertex(x, y, True)
+            for x, y in _enclosing(max_coord)])
+
+    if locate == 'walk':
+        rng = random.Random(0)
+        leaf = triangle
+        for vertex in verticies:
+            if stats is not None:
+                start = stats.clock()
+            leaf = leaf.walk(vertex, rng, stats)
+            if stats is not None:
+                located = stats.clock()
+            triangles = leaf.split(vertex, history=False)
+            if stats is not None:
+                split = stats.clock()
+            _legalize(triangles, vertex, history=False, stats=stats,
+                infinite=infinite)
+            if stats is not None:
+                stats.inserted(start, located, split, stats.clock())
+        return leaf
 
     # Add all the points
     for vertex in verticies:
-        leaf = triangle.deep_split(vertex)
-        for child in leaf.children:
-            _legalize(child, vertex)
+        if stats is not None:
+            start = stats.clock()
+        leaf = triangle.find_leaf(vertex, stats)
+        if stats is not None:
+            located = stats.clock()
+        leaf.split(vertex)
+        if stats is not None:
+            split = stats.clock()
+        _legalize(leaf.children, vertex, stats=stats)
+        if stats is not None:
+            stats.inserted(start, located, split, stats.clock())
+
+    if not keep_history:
+        # The leaves do not refer to their parents, so dropping the root
+        # frees every interior node.
+        return triangle.get_face().data
+    return triangle
+
+
+def _infinite_start(verticies):
+    """The first triangle of a mesh with a vertex at infinity.
+
+    Picks the first vertex, the next one at a different place and the next
+    one off the line through those two.  Returns a hull face of the mesh of
+    that triangle and its three hull faces, and the other vertices in their
+    original order.
+
+    """
+    first = second = third = None
+    for i, vertex in enumerate(verticies):
+        if first is None:
+            first = i
+        elif second is None:
+            a = verticies[first]
+            if vertex.x != a.x or vertex.y != a.y:
+                second = i
+        elif _orient(verticies[first], verticies[second], vertex):
+            third = i
+            break
+    if third is None:
+        raise ValueError("boundary 'infinite' needs three vertices that are "
+            "not collinear")
+
+    a, b, c = verticies[first], verticies[second], verticies[third]
+    if _orient(a, b, c) < 0:
+        b, c = c, b
+    triangle = from_triangles([a, b, c, Vertex(None, None, True)],
+        [(0, 1, 2), (1, 0, 3), (2, 1, 3), (0, 2, 3)])
+    rest = [vertex for i, vertex in enumerate(verticies)
+        if i != first and i != second and i != third]
+    return triangle, rest
+
+
+def from_triangles(verticies, triangles):
+    """Build a mesh from a list of triangles.
+
+    triangles holds counter-clockwise triples of indices into verticies.
+    Triangles sharing an edge are linked through twin edges.  There is no
+    triangle tree, so a leaf triangle of the mesh is returned.
+
+    """
+    for vertex in verticies:
+        vertex.edge = None
 
+    edges = {}
+    triangle = None
+    for corners in triangles:
+        loop = []
+        for i in xrange(3):
+            v0 = verticies[corners[i]]
+            v1 = verticies[corners[(i + 1) % 3]]
+            edge = edges.pop((v1, v0), None)
+            if edge is None:
+                edge = _make_edge_pair(v0, v1)
+                edges[(v0, v1)] = edge
+            else:
+                edge = edge.twin
+            loop.append(edge)
+
+        face = Face(loop[0])
+        for i in xrange(3):
+            loop[i].next = loop[(i + 1) % 3]
+            loop[i].face = face
+        triangle = Triangle(face)
     return triangle
 
 
-__all__ = ['Vertex', 'triangulate']
+class Triangulation(object):
+    """A Delauny triangulation that can be edited in place.
+
+    'max_coord' bounds the coordinates of every vertex, as for triangulate.
+    'leaf' is any triangle of the mesh, where point location walks start.
+
+    'verticies', 'edges' and 'triangles' are registries of everything live
+    in the mesh.  'verticies' starts with the three artificial vertices,
+    'edges' holds one half-edge of each pair.  Each object's 'index' is its
+    place in its registry, so removal is a swap with the last entry.  Use
+    iter_vertices, iter_edges and iter_faces to walk the mesh.
+
+    insert, remove and move only touch the triangles near the vertex.  Each
+    returns the triangles it changed.  A triangle whose 'face' is None has
+    been removed from the mesh; every other triangle in the list is live
+    but may have different vertices than before.
+
+    """
+    __slots__ = ['max_coord', 'leaf', 'rng', 'verticies', 'edges',
+        'triangles']
+
+    def __init__(self, verticies=(), max_coord=1.):
+        self.max_coord = max_coord
+        self.rng = random.Random(0)
+        self.verticies = []
+        self.edges = []
+        self.triangles = []
+
+        self.leaf = _make_triangle(*[Vertex(x, y, True)
+            for x, y in _enclosing(max_coord)])
+        _register(self.triangles, self.leaf)
+        edge = self.leaf.face.edge
+        for i in xrange(3):
+            _register(self.verticies, edge.origin)
+            self._add_edge(edge)
+            edge = edge.next
+
+        for v in verticies:
+            self._check_bounds(v.x, v.y)
+        for i in spatial.brio_order(verticies):
+            self._insert(verticies[i])
+
+    def __repr__(self):
+        return 'Triangulation({0} verticies, {1} triangles)'.format(
+            len(self.verticies) - 3, len(self.triangles))
+
+    def iter_vertices(self, include_artificial=False):
+        """Generate the vertices of the mesh."""
+        verticies = self.verticies
+        for i in xrange(0 if include_artificial else 3, len(verticies)):
+            yield verticies[i]
+
+    def iter_edges(self, unique=True):
+        """Generate the half-edges of the mesh.
+
+        If unique is true only one half-edge of each pair is generated.
+
+        """
+        for edge in self.edges:
+            yield edge
+            if not unique:
+                yield edge.twin
+
+    def iter_faces(self):
+        """Generate the faces of the mesh."""
+        for triangle in self.triangles:
+            yield triangle.face
+
+    def _add_edge(self, edge):
+        edge.index = edge.twin.index = len(self.edges)
+        self.edges.append(edge)
+
+    def _drop_edge(self, edge):
+        edges = self.edges
+        last = edges.pop()
+        if last is not edge and last is not edge.twin:
+            edges[edge.index] = last
+            last.index = last.twin.index = edge.index
+        edge.index = edge.twin.index = None
+
+    def _check_bounds(self, x, y):
+        if abs(x) > self.max_coord or abs(y) > self.max_coord:
+            raise ValueError('({0}, {1}) is outside max_coord {2}'.format(x, y,
+                self.max_coord))
+
+    def insert(self, v):
+        """Add vertex v to the triangulation."""
+        self._check_bounds(v.x, v.y)
+        self._insert(v)
+        return _star(v)
+
+    def _insert(self, v):
+        v.edge = None
+        leaf = self.leaf.walk(v, self.rng)
+        triangles = leaf.split(v, history=False)
+
+        _register(self.verticies, v)
+        for triangle in triangles:
+            # The far side's next edge is the twin of a new spoke.
+            self._add_edge(triangle.face.edge.next)
+        for triangle in triangles[1:]:
+            _register(self.triangles, triangle)
+
+        _legalize(triangles, v, history=False)
+        self.leaf = leaf
+
+    def remove(self, v):
+        """Remove vertex v from the triangulation.
+
+        The hole left behind is cut into triangles and then made Delauny
+        again by flipping.
+
+        """
+        if v.artificial or v.edge is None:
+            raise ValueError('{0!r} is not an input vertex of the '
+                'mesh'.format(v))
+
+        # The edges leaving v, in counter-clockwise order.
+        spokes = [v.edge]
+        while True:
+            edge = spokes[-1].next.next.twin
+            if edge is v.edge:
+                break
+            spokes.append(edge)
+        triangles = [edge.face.data for edge in spokes]
+        faces = [triangle.face for triangle in triangles]
+
+        # The rim of the hole is the far edge of each triangle around v.
+        rim = [edge.next for edge in spokes]
+        for edge in rim:
+            edge.origin.edge = edge
+        v.edge = None
+        _unregister(self.verticies, v)
+        for edge in spokes:
+            self._drop_edge(edge)
+
+        diagonals = []
+        loops = _clip_ears(rim, diagonals)
+        for edge in diagonals:
+            self._add_edge(edge)
+        for face, loop in zip(faces, loops):
+            face.edge = loop[0]
+            face.data.invalidate()
+            for edge in loop:
+                edge.face = face
+        for triangle in triangles[len(loops):]:
+            _unregister(self.triangles, triangle)
+            triangle.face.edge = None
+            triangle.face = None
+
+        self.leaf = triangles[0]
+        return triangles + [t for t in _lawson(diagonals)
+            if t not in triangles]
+
+    def move(self, v, x, y):
+        """Move vertex v to (x, y).
+
+        If v stays inside the polygon formed by its neighbours the mesh is
+        repaired by flipping around it.  Otherwise v is removed and inserted
+        again.
+
+        """
+        self._check_bounds(x, y)
+        star = _star(v)
+        old = v.x, v.y
+        v.x, v.y = x, y
+        if all(_orient(*triangle.vertices()) > 0 for triangle in star):
+            edges = []
+            for triangle in star:
+                triangle.invalidate()
+                edge = triangle.face.edge
+                edges.extend((edge, edge.next, edge.next.next))
+            return star + [t for t in _lawson(edges) if t not in star]
+
+        v.x, v.y = old
+        changed = self.remove(v)
+        v.x, v.y = x, y
+        return changed + [t for t in self.insert(v) if t not in changed]
+
+
+    def update(self, verticies, positions):
+        """Move every vertex in verticies to the matching (x, y) in positions.
+
+        This is meant for animation, where every vertex moves a little each
+        frame.  The vertices are moved in place and the edges that stopped
+        being legal are flipped.  A vertex that would turn over one of its
+        triangles is held back and then moved on its own with move, which
+        removes and inserts it again.  Returns the triangles whose vertices
+        changed.  Every triangle around a moved vertex changes shape as well.
+
+        """
+        if len(verticies) != len(positions):
+            raise ValueError('{0} verticies but {1} positions'.format(
+                len(verticies), len(positions)))
+        for x, y in positions:
+            self._check_bounds(x, y)
+
+        old = {}
+        for i in xrange(len(verticies)):
+            v = verticies[i]
+            old[v] = v.x, v.y
+            v.x, v.y = positions[i]
+
+        affected = []
+        seen = set()
+        for v in verticies:
+            for triangle in _star(v):
+                if triangle not in seen:
+                    seen.add(triangle)
+                    affected.append(triangle)
+
+        # Put vertices back until no triangle is turned over.  The mesh was
+        # valid with every vertex back, so this stops.
+        held = []
+        check = affected
+        while check:
+            inverted = [triangle for triangle in check
+                if _orient(*triangle.vertices()) <= 0]
+            check = []
+            for triangle in inverted:
+                for v in triangle.vertices():
+                    if v in old and old[v] != (v.x, v.y):
+                        held.append((v, v.x, v.y))
+                        v.x, v.y = old[v]
+                        check.extend(_star(v))
+
+        # Check each edge once, from whichever side is reached first.
+        edges = []
+        for triangle in affected:
+            triangle.invalidate()
+            first = edge = triangle.face.edge
+            while True:
+                pair = edge.twin
+                if (pair.face is None or pair.face.data not in seen or
+                        id(edge) < id(pair)):
+                    edges.append(edge)
+                edge = edge.next
+                if edge is first:
+                    break
+        changed = _lawson(edges)
+
+        seen = set(changed)
+        for v, x, y in held:
+            for triangle in self.move(v, x, y):
+                if triangle not in seen:
+                    seen.add(triangle)
+                    changed.append(triangle)
+        return changed
+
+
+def _register(registry, item):
+    """Append item to a Triangulation registry."""
+    item.index = len(registry)
+    registry.append(item)
+
+def _unregister(registry, item):
+    """Remove item from a Triangulation registry."""
+    last = registry.pop()
+    if last is not item:
+        registry[item.index] = last
+        last.index = item.index
+    item.index = None
+
+
+def _star(v):
+    """The triangles around vertex v."""
+    star = []
+    edge = v.edge
+    while True:
+        star.append(edge.face.data)
+        edge = edge.next.next.twin
+        if edge is v.edge:
+            return star
+
+
+def _clip_ears(rim, diagonals):
+    """Cut the polygon bounded by the edge loop 'rim' into triangles.
+
+    rim lists the polygon's edges in counter-clockwise order; their 'next'
+    pointers are overwritten.  New edges are appended to 'diagonals'.  Returns
+    the edge loop of each triangle.
+
+    """
+    rim = list(rim)
+    loops = []
+    while len(rim) > 3:
+        for i in xrange(len(rim)):
+            ea = rim[i - 1]
+            eb = rim[i]
+            a, b, c = ea.origin, eb.origin, eb.twin.origin
+            if _orient(a, b, c) > 0 and not any(_orient(a, b, e.origin) >= 0
+                    and _orient(b, c, e.origin) >= 0 and
+                    _orient(c, a, e.origin) >= 0 for e in rim
+                    if e.origin not in (a, b, c)):
+                break
+        else:
+            raise OutsideTriangleError()
+
+        # The new diagonal c -> a closes the ear, its twin a -> c replaces
+        # the two ear edges on the rim.
+        diagonal = _make_edge_pair(c, a)
+        diagonals.append(diagonal)
+        ea.next = eb
+        eb.next = diagonal
+        diagonal.next = ea
+        loops.append([ea, eb, diagonal])
+        if i:
+            rim[i - 1:i + 1] = [diagonal.twin]
+        else:
+            rim[-1] = diagonal.twin
+            del rim[0]
+
+    rim[0].next = rim[1]
+    rim[1].next = rim[2]
+    rim[2].next = rim[0]
+    loops.append(rim)
+    return loops
+
+
+def _lawson(edges):
+    """Flip edges until every edge reachable from 'edges' is legal.
+
+    An edge is legal if the vertex across it is not inside the circumcircle
+    of its face.  Each flip puts the four edges around it back on the stack.
+    Returns the triangles that were flipped.
+
+    """
+    flipped = []
+    seen = set()
+    stack = list(edges)
+    while stack:
+        edge = stack.pop()
+        pair = edge.twin
+        if edge.face is None or pair.face is None:
+            continue
+        if _incircle(edge.origin, edge.next.origin, edge.next.next.origin,
+                pair.next.next.origin) <= 0:
+            continue
+
+        _flip(edge)
+        for triangle in (edge.face.data, pair.face.data):
+            if triangle not in seen:
+                seen.add(triangle)
+                flipped.append(triangle)
+        stack.extend((edge.next, edge.next.next, pair.next, pair.next.next))
+    return flipped
+
+
+__all__ = ['Vertex', 'Triangulation', 'triangulate', 'from_triangles']
 
 
 ##############################################################################
 # Testing methods
 
 
-def check_triangulation(triangle):
-    """Check that every leaf triangle's incircle contains no verticies."""
-    triangles = set()
-    def add_tris(tri):
-        if not tri.children:
-            triangles.add(tri)
-        else:
-            for child in tri.children:
-                add_tris(child)
-    add_tris(triangle)
+class ValidationReport(object):
+    """What validate found in a mesh.
 
-    verts = set()
-    for triangle in triangles:
-        verts.add(triangle.face.edge.origin)
-        verts.add(triangle.face.edge.next.origin)
-        verts.add(triangle.face.edge.next.next.origin)
+    'verticies', 'edges' and 'faces' count the mesh, including the enclosing
+    triangle but not a vertex at infinity, its edges or the hull faces.  An
+    edge is a pair of half-edges.
+    'inverted' lists the faces that are not counter-clockwise.
+    'illegal' lists the edges whose far vertex is inside the circumcircle of
+    the face on this side of them.
+    A triangulated disk has Euler characteristic verticies - edges + faces
+    of 1.
+
+    """
+    __slots__ = ['verticies', 'edges', 'faces', 'inverted', 'illegal']
 
-    for triangle in triangles:
-        assert triangle.area() >= 0
-        for vert in verts:
-            assert not triangle.incircle(vert, limit=1e-10)
+    def __init__(self, verticies=0, edges=0, faces=0):
+        self.verticies = verticies
+        self.edges = edges
+        self.faces = faces
+        self.inverted = []
+        self.illegal = []
+
+    def __str__(self):
+        return ('{0} verticies, {1} edges, {2} faces, euler {3}, '
+            '{4} inverted, {5} illegal'.format(self.verticies, self.edges,
+            self.faces, self.euler(), len(self.inverted), len(self.illegal)))
+
+    def euler(self):
+        return self.verticies - self.edges + self.faces
+
+    def ok(self):
+        """True if the mesh is a Delauny triangulation of a disk."""
+        return not self.inverted and not self.illegal and self.euler() == 1
+
+
+def validate(triangle):
+    """Check the mesh containing triangle edge by edge.
+
+    triangle may also be a Triangulation or an arraymesh.ArrayMesh.  The
+    mesh is walked with iter_vertices, iter_edges and iter_faces.
+
+    Every face must be counter-clockwise and every interior edge must be
+    legal: the vertex across it is not inside the circumcircle of the face
+    on this side.  A mesh where every edge is legal is Delauny, so this does
+    the work of checking each face against every vertex in time linear in
+    the size of the mesh.  Returns a ValidationReport.
+
+    In a mesh with a vertex at infinity the edges to it are checked too, so
+    the hull must be convex.
+
+    """
+    if isinstance(triangle, arraymesh.ArrayMesh):
+        return arraymesh.validate(triangle)
+
+    report = ValidationReport()
+    for vertex in triangle.iter_vertices(include_artificial=True):
+        if vertex.x is not None:
+            report.verticies += 1
+    for face in triangle.iter_faces():
+        if not face.data.is_ghost():
+            report.faces += 1
+            if _orient(*face.data.vertices()) <= 0:
+                report.inverted.append(face.data)
+
+    for edge in triangle.iter_edges():
+        pair = edge.twin
+        if edge.origin.x is not None and pair.origin.x is not None:
+            report.edges += 1
+        if edge.face is None or pair.face is None:
+            continue
+        if pair.next.next.origin.x is None:
+            # Only the hull face's side tests the vertex across the edge.
+            edge, pair = pair, edge
+        if _incircle_infinite(edge.origin, edge.next.origin,
+                edge.next.next.origin, pair.next.next.origin) > 0:
+            report.illegal.append(edge)
+    return report
+
+def check_triangulation(triangle):
+    """Check that the mesh is a Delauny triangulation.  See validate."""
+    report = validate(triangle)
+    assert report.ok(), str(report)
 
 class DcelError(Exception):
     pass
 
 def check_dcel(triangle):
     """Checks the DCEL invariants."""
-    edges = triangle.get_face().edge_set()
-    faces = set(edge.face for edge in edges)
-    faces.discard(None)
-    verticies = set(edge.origin for edge in edges)
+    if isinstance(triangle, arraymesh.ArrayMesh):
+        return arraymesh.check_dcel(triangle)
 
     def check(expression, error, *extras):
         if not expression:
@@ -480,12 +1355,30 @@ def check_dcel(triangle):
                 error = '{0}: {1}'.format(error,
                     ', '.join(str(extra) for extra in extras))
             raise DcelError(error)
-            
+
+    edges = list(triangle.iter_edges(unique=False))
+    faces = list(triangle.iter_faces())
+    verticies = list(triangle.iter_vertices(include_artificial=True))
+    if isinstance(triangle, Triangulation):
+        # The registries must hold exactly the mesh.
+        leaf = triangle.leaf
+        check(set(edges) == set(leaf.iter_edges(unique=False)),
+            'Triangulation.edges')
+        check(set(faces) == set(leaf.iter_faces()), 'Triangulation.triangles')
+        check(set(verticies) == set(leaf.iter_vertices(
+            include_artificial=True)), 'Triangulation.verticies')
+        for registry in (triangle.verticies, triangle.edges,
+                triangle.triangles):
+            for i, item in enumerate(registry):
+                check(item.index == i, 'index', item)
+
     # Check that all verticies have a link to an outgoing edge
-    for vertex in verticies:
+    for edge in edges:
+        vertex = edge.origin
         check(vertex.edge is not None, 'Vertex.edge is None', vertex)
         check(vertex.edge.origin == vertex, 'Vertex.edge', vertex, vertex.edge)
-    
+    check(len(set(verticies)) == len(verticies), 'iter_vertices')
+
     # Check that all edges make well formed loops
     seen = set()
     for first in edges: